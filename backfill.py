@@ -0,0 +1,55 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import panel_adapters
+from combine_and_save_data import merge_into_summary, publish_summary, output_summary_file
+
+# --- Backfill หลายเดือนพร้อมกัน: ประมวลผลทุกคู่ (panel, month) ใน process pool แล้วเขียน summary ครั้งเดียว ---
+# ตัวอย่าง: python backfill.py 2024-01 2025-12 --panels DS MS --workers 8
+# panel = adapter ที่ลงทะเบียนไว้ใน panel_adapters.py
+
+
+def month_range(start_month, end_month):
+    return [month.strftime('%Y-%m-%d') for month in pd.date_range(start_month, end_month, freq='MS')]
+
+
+def run_backfill(start_month, end_month, panels=None, max_workers=None, output_summary_file=output_summary_file):
+    panels = panel_adapters.registered_panels() if panels is None else panels
+    jobs = [(panel, month) for month in month_range(start_month, end_month) for panel in panels]
+    results = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(panel_adapters.process_panel, panel, month): (panel, month) for panel, month in jobs}
+        for future in as_completed(futures):
+            panel, month = futures[future]
+            try:
+                results.append(future.result())
+                print(f"[done] {panel} {month}")
+            except Exception as e:
+                failures.append((panel, month, e))
+                print(f"[failed] {panel} {month}: {e}")
+
+    if results:
+        merge_into_summary(pd.concat(results, ignore_index=True), output_summary_file)
+        publish_summary(output_summary_file)
+    return len(results), failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-process a range of months for every panel and rewrite the summary once.')
+    parser.add_argument('start_month', help='first month, e.g. 2024-01')
+    parser.add_argument('end_month', help='last month (inclusive), e.g. 2025-12')
+    parser.add_argument('--panels', nargs='+', choices=sorted(panel_adapters.registered_panels()),
+                        default=sorted(panel_adapters.registered_panels()))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    n_done, failures = run_backfill(args.start_month, args.end_month, args.panels, args.workers)
+    print(f"\nBackfilled {n_done} (panel, month) results into '{output_summary_file}'.")
+    if failures:
+        print(f"{len(failures)} job(s) failed:")
+        for panel, month, e in failures:
+            print(f"  {panel} {month}: {e}")
@@ -0,0 +1,147 @@
+import itertools
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from respondent_cube import audience_filters
+
+# --- Bitmap index ของ MS respondents: 1 bit-array (packed) ต่อ 1 category value ---
+# audience expression (AND / OR / NOT) คำนวณเป็น bitwise ops บน uint64 แล้วนับด้วย popcount
+# process_ms_data.py บันทึก index ทุกเดือนที่ processed_data/ms_bitmap_YYYYMM.npz (ข้าง ๆ respondent cube)
+#
+# ตัวอย่าง:
+#   expr = Audience('Silver_Gen') & Audience('Auto') & ~Term('Region', 'Bangkok_Metropolitan')
+#   count_audience(expr, [BitmapIndex.load(bitmap_path(m)) for m in ['202505', '202506']])
+
+bitmap_folder = './processed_data/'
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words):
+        return int(np.bitwise_count(words).sum())
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return int(_POPCOUNT_TABLE[words.view(np.uint8)].sum())
+
+
+def bitmap_path(month_code, folder=bitmap_folder):
+    return f"{folder}ms_bitmap_{month_code}.npz"
+
+
+def _pack(flags):
+    # bool array -> packed bits ที่ pad ให้ครบ 8 bytes แล้ว view เป็น uint64 (bitwise ops ทีละ 64 respondents)
+    packed = np.packbits(flags)
+    padded = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+    padded[:len(packed)] = packed
+    return padded.view(np.uint64)
+
+
+def iter_bitmaps(codes, categories):
+    # ทีละ bitmap: codes เป็น cube แบบ mmap ได้ (อ่านทีละ dimension ไม่ต้องโหลดทั้ง cube)
+    for dim, dim_codes in codes.items():
+        dim_codes = np.asarray(dim_codes)
+        for code, category in enumerate(categories[dim]):
+            yield f'{dim}={category}', _pack(dim_codes == code)
+
+
+def save_bitmap_index(path, codes, categories):
+    n_respondents = len(next(iter(codes.values()), []))
+    meta = json.dumps({'n_respondents': n_respondents, 'categories': categories}, ensure_ascii=False)
+    # เขียนไฟล์ชั่วคราวในโฟลเดอร์เดียวกันแล้ว os.replace: ผู้อ่านไม่เห็น index ที่เขียนไม่ครบ (เหมือน save_cube)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp_', suffix='.npz')
+    try:
+        # เขียนเป็น .npz (zip ของ .npy แบบเดียวกับ np.savez) ทีละ bitmap -> ไม่ต้องถือ bitmap ทั้งหมดไว้ในหน่วยความจำ
+        with os.fdopen(fd, 'wb') as f, zipfile.ZipFile(f, 'w', zipfile.ZIP_STORED, allowZip64=True) as npz:
+            arrays = itertools.chain([('__meta__', np.array(meta))], iter_bitmaps(codes, categories))
+            for name, array in arrays:
+                with npz.open(f'{name}.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array(member, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class BitmapIndex:
+    def __init__(self, bitmaps, categories, n_respondents):
+        self.bitmaps = bitmaps
+        self.categories = categories
+        self.n_respondents = n_respondents
+        self.all_bits = _pack(np.ones(n_respondents, dtype=bool))  # ใช้ตัด padding bits ตอน NOT
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['__meta__']))
+            bitmaps = {key: data[key] for key in data.files if key != '__meta__'}
+        return cls(bitmaps, meta['categories'], meta['n_respondents'])
+
+    def bitmap(self, dim, categories):
+        result = np.zeros_like(self.all_bits)
+        for category in categories:
+            result |= self.bitmaps[f'{dim}={category}']
+        return result
+
+    def count(self, expr):
+        return _popcount(expr.evaluate(self))
+
+
+# --- Audience expressions ---
+class Expr:
+    def __and__(self, other):
+        return _Binary(np.bitwise_and, self, other)
+
+    def __or__(self, other):
+        return _Binary(np.bitwise_or, self, other)
+
+    def __invert__(self):
+        return _Not(self)
+
+
+class Term(Expr):
+    def __init__(self, dim, *categories):
+        self.dim = dim
+        self.categories = categories
+
+    def evaluate(self, index):
+        return index.bitmap(self.dim, self.categories)
+
+
+class Audience(Expr):
+    # audience ที่นิยามไว้ใน respondent_cube.audience_filters เช่น 'Silver_Gen', 'Auto', 'UPC'
+    def __init__(self, name):
+        self.name = name
+
+    def evaluate(self, index):
+        result = index.all_bits.copy()
+        for dim, categories in audience_filters[self.name].items():
+            result &= index.bitmap(dim, categories)
+        return result
+
+
+class _Binary(Expr):
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def evaluate(self, index):
+        return self.op(self.left.evaluate(index), self.right.evaluate(index))
+
+
+class _Not(Expr):
+    def __init__(self, operand):
+        self.operand = operand
+
+    def evaluate(self, index):
+        return index.all_bits & ~self.operand.evaluate(index)
+
+
+def count_audience(expr, indexes):
+    # รวมจำนวนข้ามหลายเดือน (1 index ต่อเดือน)
+    return sum(index.count(expr) for index in indexes)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# --- Category-code engine ---
+# factorize คอลัมน์ดิบครั้งเดียว -> map เฉพาะค่า unique -> broadcast integer codes กลับไปทุกแถว
+# ต้นทุนของ mapping จึงขึ้นกับจำนวนคำตอบที่ไม่ซ้ำกัน ไม่ใช่จำนวน respondents
+
+
+def record_unmapped(unmapped, uniques, fell_through, raw_codes, weights=None):
+    # unmapped: dict str(ค่าดิบ) -> จำนวนแถว ของค่าที่ตกไปที่ default (นับจาก raw_codes ที่ factorize ไว้แล้ว ไม่ scan ซ้ำ)
+    # weights: จำนวนต่อแถว (เช่น Count ของไฟล์ DS ที่สรุปมาแล้ว) แทนการนับ 1 ต่อแถว
+    if unmapped is None or not fell_through.any():
+        return
+    row_counts = np.bincount(raw_codes, weights=weights, minlength=len(uniques))
+    for index in np.flatnonzero(fell_through):
+        key = '<NA>' if pd.isna(uniques[index]) else str(uniques[index])
+        unmapped[key] = unmapped.get(key, 0) + int(round(row_counts[index]))
+
+
+def lookup_codes(values, mapper, categories, default, memo=None, unmapped=None, weights=None):
+    # mapper รับค่าดิบ 1 ค่า แล้วคืนชื่อ category (None หรือค่าที่ไม่อยู่ใน categories จะตกไปที่ default)
+    # memo: dict str(ค่าดิบ) -> ผลของ mapper ที่เคยคำนวณแล้ว (ค่าที่ยังไม่มีจะถูกเติมลงไป)
+    # unmapped: ถ้าส่ง dict มา จะนับค่าดิบที่ตกไปที่ default ลงไปด้วย (ดู data_quality.py)
+    position = {category: code for code, category in enumerate(categories)}
+    raw_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    if memo is None:
+        mapped = [mapper(value) for value in uniques]
+    else:
+        mapped = []
+        for value in uniques:
+            key = str(value)
+            if key not in memo:
+                memo[key] = mapper(value)
+            mapped.append(memo[key])
+    unique_codes = np.array([position.get(category, position[default]) for category in mapped], dtype=np.int8)
+    fell_through = np.array([category is None or category not in position for category in mapped], dtype=bool)
+    record_unmapped(unmapped, uniques, fell_through, raw_codes, weights)
+    return unique_codes.take(raw_codes)
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def band_codes(values, edges, categories, default, unmapped=None):
+    # edges แบบ [18, 20, 30, ...] -> band i ครอบคลุม edges[i] <= x < edges[i + 1]
+    # ค่าที่แปลงเป็น int ไม่ได้ หรืออยู่นอกช่วง จะได้ code ของ default (และถูกนับลง unmapped ถ้าส่งมา)
+    raw_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    parsed = [parse_int(value) for value in uniques]
+    numbers = np.array([np.nan if value is None else value for value in parsed], dtype=float)
+    bands = np.searchsorted(np.asarray(edges, dtype=float), numbers, side='right') - 1
+    in_range = ~np.isnan(numbers) & (bands >= 0) & (bands < len(edges) - 1)
+    unique_codes = np.where(in_range, bands, categories.index(default)).astype(np.int8)
+    record_unmapped(unmapped, uniques, ~in_range, raw_codes)
+    return unique_codes.take(raw_codes)
+
+
+def count_codes(codes, categories):
+    # value counts ของ codes เรียงตามลำดับ categories
+    return np.bincount(codes, minlength=len(categories))
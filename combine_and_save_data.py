@@ -1,72 +1,84 @@
 import pandas as pd
 import os
+import summary_store
+import respondent_tracking
+import mapping_registry
+import panel_adapters
 
 
 current_month = '2025-06-01'
-output_summary_file = 'monthly_profiling_summary.csv'
+output_summary_file = summary_store.summary_db_file
 processed_data_folder = './processed_data/'
 
-all_common_data_model_columns = [
-    "Panel_Source", "Collected_Month", "Total_Respondents_Count", "Gender_Male_Count", "Gender_Female_Count",
-    "Age_18_19_Count", "Age_20_29_Count", "Age_30_39_Count", "Age_40_49_Count", "Age_50_59_Count",
-    "Age_60_69_Count", "Age_70_99_Count",
-    "SES_Personal_A_Count", "SES_Personal_B_Plus_Count", "SES_Personal_B_Count", "SES_Personal_C_Plus_Count",
-    "SES_Personal_C_Count", "SES_Personal_D_Count", "SES_Personal_E_Count", "SES_Personal_Unspecified_Count",
-    "SES_Household_A_Count", "SES_Household_B_Plus_Count", "SES_Household_B_Count", "SES_Household_C_Plus_Count",
-    "SES_Household_C_Count", "SES_Household_D_Count", "SES_Household_E_Count", "SES_Household_Unspecified_Count",
-    "Occupation_Government_Count", "Occupation_Professional_Count", "Occupation_Commercial_Service_Count",
-    "Occupation_Student_Count", "Occupation_General_Labor_Count", "Occupation_Unemployed_Count",
-    "Occupation_Housewife_Count", "Occupation_Others_Count", "Occupation_Unspecified_Count",
-    "Employment_Employed_Someone_Else_More_30_Hrs_Count", "Employment_Employed_Someone_Else_Less_30_Hrs_Count",
-    "Employment_Self_Employed_Count", "Employment_Not_Employed_Looking_Count", "Employment_Student_Count",
-    "Employment_Housewife_Count", "Employment_Not_Employed_Other_Count", "Employment_Unspecified_Count",
-    "Region_Bangkok_Metropolitan_Count", "Region_Central_Count", "Region_Northeast_Count", "Region_North_Count",
-    "Region_East_Count", "Region_West_Count", "Region_South_Count", "Region_Unspecified_Count",
-    "Cars_At_Home_0_Count", "Cars_At_Home_1_Count", "Cars_At_Home_2_Count", "Cars_At_Home_3_Or_More_Count",
-    "Cars_At_Home_Unspecified_Count",
-    "Car_Owner_Yourself_Count", "Car_Owner_Spouse_Count", "Car_Owner_Parent_Count", "Car_Owner_Child_Count",
-    "Car_Owner_Grandparents_Count", "Car_Owner_Brothers_Sisters_Count", "Car_Owner_Others_Count", "Car_Owner_Dont_Know_Count"
-]
-
-ds_processed_file = f"{processed_data_folder}temp_ds_data_{current_month.replace('-', '')[:6]}.csv"
-ms_processed_file = f"{processed_data_folder}temp_ms_data_{current_month.replace('-', '')[:6]}.csv"
-
-try:
-    df_ds_result = pd.read_csv(ds_processed_file)
-    df_ms_result = pd.read_csv(ms_processed_file)
-except FileNotFoundError:
-    print("Error: Processed temporary files not found.")
-    print("Please ensure you have run process_ds_data.py and process_ms_data.py successfully for this month.")
-    exit()
-except Exception as e:
-    print(f"Error reading processed data: {e}")
-    exit()
-
-df_ds_final = df_ds_result.reindex(columns=all_common_data_model_columns).fillna(0)
-df_ms_final = df_ms_result.reindex(columns=all_common_data_model_columns).fillna(0)
-
-df_current_month_combined = pd.concat([df_ds_final, df_ms_final], ignore_index=True)
-
-print("\nCombined Data for Current Month:")
-print(df_current_month_combined)
-
-try:
-
-    df_existing_summary = pd.read_csv(output_summary_file)
-
-    df_existing_summary = df_existing_summary[df_existing_summary['Collected_Month'] != current_month]
-
-    df_updated_summary = pd.concat([df_existing_summary, df_current_month_combined], ignore_index=True)
-
-except FileNotFoundError:
-    print(f"'{output_summary_file}' not found. Creating a new summary file.")
-    df_updated_summary = df_current_month_combined
-except Exception as e:
-    print(f"Error processing existing summary file: {e}")
-    exit()
-2
-df_updated_summary = df_updated_summary.reindex(columns=all_common_data_model_columns).fillna(0)
-df_updated_summary.to_csv(output_summary_file, index=False, encoding='utf-8')
-
-print(f"\nSuccessfully updated '{output_summary_file}' with data for {current_month}.")
-print(f"Total rows in {output_summary_file}: {len(df_updated_summary)}")
\ No newline at end of file
+all_common_data_model_columns = mapping_registry.all_common_data_model_columns
+
+def to_common_model(df):
+    # reindex ตาม common model แล้วให้คอลัมน์ Count เป็น integer เสมอ (ไม่ปล่อยให้กลายเป็น float 0.0)
+    # คอลัมน์ tracking เป็น nullable integer: ค่าว่าง = ไม่มีข้อมูล (เช่น panel ที่ไม่มี Respondent_ID) ไม่ใช่ 0
+    df = df.reindex(columns=all_common_data_model_columns)
+    count_columns = [col for col in df.columns if '_Count' in col and col not in mapping_registry.tracking_columns]
+    df[count_columns] = df[count_columns].fillna(0).astype('int64')
+    df[mapping_registry.tracking_columns] = df[mapping_registry.tracking_columns].astype('Int64')
+    return df
+
+
+def temp_result_path(panel, current_month):
+    return f"{processed_data_folder}temp_{panel.lower()}_data_{current_month.replace('-', '')[:6]}.csv"
+
+
+def load_processed_month(current_month):
+    # temp CSV ของทุก panel ที่ลงทะเบียนไว้ (panel ที่ยังไม่มีไฟล์ของเดือนนี้จะถูกข้าม)
+    paths = {panel: temp_result_path(panel, current_month) for panel in panel_adapters.registered_panels()}
+    missing = [panel for panel, path in paths.items() if not os.path.exists(path)]
+    if len(missing) == len(paths):
+        raise FileNotFoundError("No processed panel files found:\n  " + "\n  ".join(paths.values()))
+    if missing:
+        print(f"Skipping panels without processed files: {', '.join(missing)}")
+    return pd.concat(
+        [to_common_model(pd.read_csv(path)) for panel, path in paths.items() if panel not in missing], ignore_index=True)
+
+
+def merge_into_summary(df_new_rows, output_summary_file=output_summary_file):
+    # upsert เฉพาะแถวของ (Panel_Source, Collected_Month) ที่ส่งเข้ามา แล้วคืนจำนวนแถวทั้งหมดใน summary
+    # ไม่ publish snapshot: ผู้เรียก publish_summary ครั้งเดียวตอนจบ run/backfill
+    # New/Returning/Churned ของแถว MS คำนวณตรงนี้ (หลังทุกเดือนใน batch มี cube แล้ว เช่นตอน backfill แบบขนาน)
+    # เดือนถัดไปของแต่ละเดือนที่เข้ามาถูกคำนวณใหม่และ upsert ด้วย (เดือนก่อนหน้าของมันเปลี่ยน) ต้นทุนคงที่ไม่ขึ้นกับ history
+    following = respondent_tracking.following_months(df_new_rows)
+    if following:
+        df_following = summary_store.load_summary(output_summary_file, panels=[respondent_tracking.tracking_panel], months=following)
+        df_new_rows = pd.concat([to_common_model(df_new_rows), to_common_model(df_following)], ignore_index=True)
+    df_new_rows = respondent_tracking.add_tracking_columns(df_new_rows)
+    summary_store.upsert_rows(to_common_model(df_new_rows), output_summary_file)
+    return summary_store.count_rows(output_summary_file)
+
+
+def publish_summary(output_summary_file=output_summary_file):
+    # publish snapshot ใหม่ให้ dashboard (อ่านทั้ง summary ครั้งเดียวต่อ run)
+    version = summary_store.publish_snapshot(output_summary_file)
+    print(f"Published summary snapshot v{version}")
+    return version
+
+
+if __name__ == '__main__':
+    try:
+        df_current_month_combined = load_processed_month(current_month)
+    except FileNotFoundError:
+        print("Error: Processed temporary files not found.")
+        print("Please ensure you have run the panel processors (e.g. process_ds_data.py, process_ms_data.py) for this month.")
+        exit()
+    except Exception as e:
+        print(f"Error reading processed data: {e}")
+        exit()
+
+    print("\nCombined Data for Current Month:")
+    print(df_current_month_combined)
+
+    try:
+        total_rows = merge_into_summary(df_current_month_combined)
+        publish_summary()
+    except Exception as e:
+        print(f"Error processing existing summary file: {e}")
+        exit()
+
+    print(f"\nSuccessfully updated '{output_summary_file}' with data for {current_month}.")
+    print(f"Total rows in {output_summary_file}: {total_rows}")
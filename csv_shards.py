@@ -0,0 +1,74 @@
+import io
+
+from panel_io import read_csv_text
+
+# --- แบ่งไฟล์ CSV ใหญ่เป็นช่วง byte ที่ตัดตรงขอบ record พอดี (quote-aware) ให้หลาย process อ่านพร้อมกันได้ ---
+# คำตอบบางช่องมีการขึ้นบรรทัดใหม่อยู่ใน "..." (เช่น Q5_Occupation) จึงตัดที่ '\n' ตรง ๆ ไม่ได้:
+# '\n' จะเป็นขอบ record ก็ต่อเมื่อจำนวน '"' ก่อนหน้ามันเป็นเลขคู่ ("" ภายใน field นับ 2 ครั้ง parity จึงไม่เปลี่ยน)
+
+
+def count_quotes(path, start, end, block_size=1 << 24):
+    quotes = 0
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            quotes += block.count(b'"')
+            remaining -= len(block)
+    return quotes
+
+
+def _next_record_start(path, position, quotes_before, window=1 << 20):
+    # หา '\n' ตัวแรกตั้งแต่ position ที่อยู่นอก quote แล้วคืนตำแหน่ง byte ถัดจากมัน (None ถ้าไม่เจอจนจบไฟล์)
+    odd = quotes_before % 2 == 1
+    with open(path, 'rb') as f:
+        f.seek(position)
+        while True:
+            block = f.read(window)
+            if not block:
+                return None
+            offset = 0
+            newline = block.find(b'\n')
+            while newline != -1:
+                odd ^= block.count(b'"', offset, newline) % 2 == 1
+                if not odd:
+                    return position + newline + 1
+                offset = newline
+                newline = block.find(b'\n', newline + 1)
+            odd ^= block.count(b'"', offset) % 2 == 1
+            position += len(block)
+
+
+def split_records(path, n_shards, map=map):
+    # คืน (header_bytes, [(start, end), ...]) โดยแต่ละช่วงมีแต่ record ที่สมบูรณ์ และเรียงตามลำดับในไฟล์
+    # map: ส่ง executor.map เข้ามาเพื่อนับ '"' ของแต่ละช่วงแบบขนาน (ไม่งั้นอ่านไฟล์รอบเดียวใน process นี้)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        size = f.seek(0, 2)
+    first = len(header)
+    if n_shards <= 1 or size <= first:
+        return header, [(first, size)]
+
+    targets = [first + (size - first) * i // n_shards for i in range(n_shards + 1)]
+    segments = list(zip(targets[:-1], targets[1:]))
+    segment_quotes = list(map(count_quotes, [path] * len(segments), *zip(*segments)))
+
+    starts, quotes_before = [first], 0
+    for (target, _), quotes in zip(segments[1:], segment_quotes[:-1]):
+        quotes_before += quotes
+        start = _next_record_start(path, target, quotes_before)
+        if start is not None and starts[-1] < start < size:
+            starts.append(start)
+    return header, list(zip(starts, starts[1:] + [size]))
+
+
+def read_record_range(path, header, start, end, columns):
+    # อ่านเฉพาะ bytes [start, end) แล้ว parse พร้อม header ของไฟล์ เป็นข้อความเหมือน panel_io.read_text_columns
+    # ไม่ใช้ thread ของ pyarrow: แต่ละช่วงถูกอ่านใน worker process แยกกันอยู่แล้ว
+    with open(path, 'rb') as f:
+        f.seek(start)
+        body = f.read(end - start)
+    return read_csv_text(io.BytesIO(header + body), columns, use_threads=False)
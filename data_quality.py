@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+import mapping_registry
+
+# --- Data-quality report ต่อ panel ต่อเดือน (processed_data/quality/{PANEL}_{YYYYMM}.json) ---
+# เก็บระหว่าง aggregation รอบเดียวกัน (ไม่ scan ข้อมูลซ้ำ):
+#   MS: category_codes.lookup_codes / band_codes นับค่าดิบที่ตกไปที่ default จาก codes ที่ factorize ไว้แล้ว
+#   DS: process_ds_data.count_dimension บันทึก label ที่ map ไม่ได้พร้อมผลรวม count (ผ่าน mapping_registry.DimensionMap.encode)
+# และตรวจว่าผลรวมคอลัมน์ของแต่ละ dimension เท่ากับ Total_Respondents_Count หรือไม่
+#   (difference < 0 = มีแถวที่ไม่ถูกนับ เช่น gender อื่น ๆ หรืออายุนอกช่วง, > 0 = ถูกนับเกิน)
+
+quality_folder = './processed_data/quality/'
+
+
+def quality_report_path(panel, month_code, folder=quality_folder):
+    return os.path.join(folder, f'{panel}_{month_code}.json')
+
+
+def dimension_sum_checks(df_result):
+    # df_result: DataFrame 1 แถวตาม common model
+    row = df_result.iloc[0]
+    total = int(row['Total_Respondents_Count'])
+    checks = {}
+    for dim in mapping_registry.common_dimensions:
+        dimension_sum = int(row[mapping_registry.dimension_columns(dim)].sum())
+        checks[dim] = {'sum': dimension_sum, 'total': total, 'difference': dimension_sum - total}
+    return checks
+
+
+def quality_report(panel, current_month, df_result, unmapped):
+    # unmapped: dimension -> {ค่าดิบ: จำนวน} เรียงจากมากไปน้อยใน report
+    sum_checks = dimension_sum_checks(df_result)
+    dimensions = {}
+    for dim in mapping_registry.common_dimensions:
+        values = sorted(unmapped.get(dim, {}).items(), key=lambda item: (-item[1], item[0]))
+        dimensions[dim] = {
+            'unmapped_count': sum(count for _, count in values),
+            'unmapped_values': [{'value': value, 'count': count} for value, count in values],
+            'sum_check': sum_checks[dim],
+        }
+    return {
+        'panel': panel,
+        'collected_month': pd.to_datetime(current_month).strftime('%Y-%m-%d'),
+        'total_respondents': int(df_result['Total_Respondents_Count'].iloc[0]),
+        'dimensions': dimensions,
+    }
+
+
+def write_quality_report(panel, current_month, df_result, unmapped, folder=quality_folder):
+    return save_quality_report(quality_report(panel, current_month, df_result, unmapped), folder)
+
+
+def load_quality_report(panel, current_month, folder=quality_folder):
+    try:
+        with open(quality_report_path(panel, pd.to_datetime(current_month).strftime('%Y%m'), folder), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_quality_report(report, folder=quality_folder):
+    # เขียน report ที่สร้างแล้ว (เช่นจาก cache ของ panel_cache) ลง quality_folder แบบ atomic แล้วพิมพ์สรุป
+    panel = report['panel']
+    os.makedirs(folder, exist_ok=True)  # หลาย panel/เดือนเขียนพร้อมกันได้ (run_adapters, backfill)
+    path = quality_report_path(panel, pd.to_datetime(report['collected_month']).strftime('%Y%m'), folder)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    dimensions = report['dimensions'].values()
+    unmapped_rows = sum(dim['unmapped_count'] for dim in dimensions)
+    mismatched = [dim for dim, info in report['dimensions'].items() if info['sum_check']['difference'] != 0]
+    print(f"Data quality ({panel} {path}): {unmapped_rows:,} rows with unmapped values, "
+          f"dimension sums != total: {', '.join(mismatched) if mismatched else 'none'}")
+    return path
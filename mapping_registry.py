@@ -0,0 +1,318 @@
+import numpy as np
+import pandas as pd
+
+import category_codes
+from category_codes import lookup_codes, band_codes, count_codes
+from text_normalization import normalize_text, normalize_keys
+
+# --- Mapping registry: common data model + mapping ของทุก panel (แก้ที่นี่ที่เดียว) ---
+# ทั้ง process_ds_data.py, process_ms_data.py, combine_and_save_data.py และ data_quality.py ใช้คอลัมน์/categories จากโมดูลนี้
+# แต่ละ dimension ของแต่ละ panel เป็น DimensionMap ที่ compile ครั้งเดียวตอน import:
+#   mapping แบบ dict ถูก normalize key ไว้แล้ว (ดู text_normalization.py), ฟังก์ชัน (เช่น SES rules) คืนชื่อ category หรือ None
+#   encode() = factorize คอลัมน์ดิบ -> map เฉพาะค่า unique -> take เป็น int8 codes ตามลำดับ categories
+# ทุก panel map ไปที่ชื่อ category เดียวกับ common model (เช่น 'B_Plus' ไม่ใช่ 'B+')
+# เพิ่ม category ใหม่ -> เพิ่มใน common_dimensions, เพิ่ม panel ใหม่ -> เพิ่มชุด DimensionMap ของ panel นั้น
+
+# --- 1. Common data model ---
+ses_levels = ['A', 'B_Plus', 'B', 'C_Plus', 'C', 'D', 'E', 'Unspecified']
+
+# dimension -> (prefix ของคอลัมน์, categories ตามลำดับคอลัมน์)
+common_dimensions = {
+    'Gender': ('Gender', ['Male', 'Female']),
+    'Age': ('Age', ['18_19', '20_29', '30_39', '40_49', '50_59', '60_69', '70_99']),
+    'SES_Personal': ('SES_Personal', ses_levels),
+    'SES_Household': ('SES_Household', ses_levels),
+    'Occupation': ('Occupation', [
+        'Government', 'Professional', 'Commercial_Service', 'Student', 'General_Labor',
+        'Unemployed', 'Housewife', 'Others', 'Unspecified'
+    ]),
+    'Employment': ('Employment', [
+        'Employed_Someone_Else_More_30_Hrs', 'Employed_Someone_Else_Less_30_Hrs', 'Self_Employed',
+        'Not_Employed_Looking', 'Student', 'Housewife', 'Not_Employed_Other', 'Unspecified'
+    ]),
+    'Region': ('Region', ['Bangkok_Metropolitan', 'Central', 'Northeast', 'North', 'East', 'West', 'South', 'Unspecified']),
+    'Cars': ('Cars_At_Home', ['0', '1', '2', '3_Or_More', 'Unspecified']),
+    'Car_Owner': ('Car_Owner', [
+        'Yourself', 'Spouse', 'Parent', 'Child', 'Grandparents',
+        'Brothers_Sisters', 'Others', 'Dont_Know'
+    ]),
+}
+
+# New/Returning/Churned ของ MS (เติมโดย respondent_tracking.py ตอน combine, ค่าว่าง = ไม่มีข้อมูล เช่น panel ที่ไม่มี Respondent_ID)
+tracking_columns = ['New_Respondents_Count', 'Returning_Respondents_Count', 'Churned_Respondents_Count']
+
+
+def dimension_columns(dim):
+    prefix, categories = common_dimensions[dim]
+    return [f'{prefix}_{category}_Count' for category in categories]
+
+
+all_common_data_model_columns = (
+    ['Panel_Source', 'Collected_Month', 'Total_Respondents_Count']
+    + [col for dim in common_dimensions for col in dimension_columns(dim)]
+    + tracking_columns
+)
+
+
+def common_model_row(panel, current_month, total, counts, dimension_maps):
+    # จำนวนต่อ category ของทุก dimension -> DataFrame 1 แถวตาม common model (คอลัมน์ Count เป็น integer เสมอ)
+    # counts: dimension -> จำนวนต่อ category ตามลำดับ dimension_maps[dimension].categories
+    # tracking_columns ไม่เติม 0: เป็น Int64 ค่าว่างจนกว่า respondent_tracking จะคำนวณตอน combine
+    summary = {'Panel_Source': panel, 'Collected_Month': pd.to_datetime(current_month), 'Total_Respondents_Count': total}
+    for dim, dim_map in dimension_maps.items():
+        summary.update(dim_map.to_columns(np.asarray(counts[dim])))
+    df_result = pd.DataFrame([summary]).reindex(columns=all_common_data_model_columns)
+    count_columns = [col for col in df_result.columns if '_Count' in col and col not in tracking_columns]
+    df_result[count_columns] = df_result[count_columns].fillna(0).astype('int64')
+    df_result[tracking_columns] = df_result[tracking_columns].astype('Int64')
+    return df_result
+
+
+# --- 2. Compiled mapping ของ 1 dimension ใน 1 panel ---
+class DimensionMap:
+    def __init__(self, dim, rule, default=None):
+        # rule: dict ค่าดิบ -> category, ฟังก์ชัน ค่าดิบ -> category หรือ None, หรือ list ขอบช่วงตัวเลข (เช่นอายุ ดู band_codes)
+        # default: category ของค่าที่ map ไม่ได้ (None = ไม่นับในคอลัมน์ใด)
+        #   ถ้า default ไม่อยู่ใน common model (เช่น Age 'Unspecified' ของ MS) จะเป็น category ท้ายสุดที่ไม่มีคอลัมน์
+        _, common_categories = common_dimensions[dim]
+        self.dim = dim
+        self.columns = dimension_columns(dim)
+        self.default = default
+        self.categories = common_categories + ([default] if default is not None and default not in common_categories else [])
+        self.edges = rule if isinstance(rule, list) else None
+        if isinstance(rule, dict):
+            normalized_rule = normalize_keys(rule)
+            self.rule = lambda value: normalized_rule.get(normalize_text(value))
+        else:
+            self.rule = rule
+
+    def encode(self, values, memo=None, unmapped=None, weights=None):
+        # คอลัมน์ดิบ -> int8 codes ตามลำดับ self.categories (default=None -> code len(categories) ซึ่งไม่ถูกนับ)
+        if self.edges is not None:
+            return band_codes(values, self.edges, self.categories, self.default, unmapped)
+        if self.default is None:
+            return lookup_codes(values, self.rule, self.categories + [None], None, memo, unmapped, weights)
+        return lookup_codes(values, self.rule, self.categories, self.default, memo, unmapped, weights)
+
+    def counts(self, codes, weights=None):
+        # จำนวนต่อ category (weights = จำนวนต่อแถวสำหรับไฟล์ที่สรุปมาแล้ว)
+        if weights is None:
+            return count_codes(codes, self.categories + [None])[:len(self.categories)]
+        return pd.Series(weights).groupby(codes).sum().reindex(range(len(self.categories)), fill_value=0).to_numpy()
+
+    def to_columns(self, counts):
+        # counts ตามลำดับ self.categories -> {คอลัมน์ของ common model: จำนวน} (category นอก common model ถูกตัดออก)
+        return {col: counts[code] for code, col in enumerate(self.columns)}
+
+
+# --- 3. MS (Meow panel): คำตอบภาษาไทย ระดับ respondent ---
+ms_gender_map = {'ชาย': 'Male', 'หญิง': 'Female', 'male': 'Male', 'female': 'Female', 'other': 'Other'}
+
+# ขอบของช่วงอายุ: band i ครอบคลุม edges[i] <= อายุ < edges[i + 1] (18-19, 20-29, ..., 70-99)
+age_band_edges = [18, 20, 30, 40, 50, 60, 70, 100]
+
+def map_ms_income_to_ses(income_range_str):
+    income_range_str = normalize_text(income_range_str)
+    if '100,000 thb or higher' in income_range_str or '100,000 - 200,000 thb' in income_range_str or '200,001 - 300,000 thb' in income_range_str:
+        return 'A'
+    elif '50,000 - 99,999 thb' in income_range_str or '50,001 - 75,000 thb' in income_range_str or '70,000 - 79,999 thb' in income_range_str or '60,000 - 69,999 thb' in income_range_str:
+        return 'B_Plus'
+    elif '30,000 - 49,999 thb' in income_range_str or '40,000 - 49,999 thb' in income_range_str:
+        return 'B'
+    elif '20,000 - 29,999 thb' in income_range_str:
+        return 'C_Plus'
+    elif '10,000 - 19,999 thb' in income_range_str or '10,000 - 14,999 thb' in income_range_str:
+        return 'C'
+    elif '5,000 - 9,999 thb' in income_range_str or '<10,000 thb' in income_range_str:
+        return 'D'
+    elif 'less than 5,000 thb' in income_range_str:
+        return 'E'
+    elif 'don\'t know' in income_range_str or 'i do not want to answer' in income_range_str or 'have not answered yet' in income_range_str or pd.isna(income_range_str) or 'ไม่ระบุ' in income_range_str or 'nan' in income_range_str:
+        return 'Unspecified'
+    else:
+        return None  # ไม่ตรงกฎใดเลย -> ใช้ default ของ dimension และถูกบันทึกใน data-quality report
+
+ms_province_to_region_map = {
+    'กรุงเทพมหานคร': 'Bangkok_Metropolitan', 'สมุทรปราการ': 'Bangkok_Metropolitan', 'นนทบุรี': 'Bangkok_Metropolitan',
+    'ปทุมธานี': 'Bangkok_Metropolitan', 'นครปฐม': 'Bangkok_Metropolitan', 'สมุทรสาคร': 'Bangkok_Metropolitan',
+    'กาญจนบุรี': 'Central', 'ชัยนาท': 'Central', 'นครนายก': 'Central', 'พระนครศรีอยุธยา': 'Central', 'ลพบุรี': 'Central',
+    'สระบุรี': 'Central', 'สิงห์บุรี': 'Central', 'อ่างทอง': 'Central', 'ราชบุรี': 'Central', 'สุพรรณบุรี': 'Central',
+    'สมุทรสงคราม': 'Central', 'เชียงใหม่': 'North', 'เชียงราย': 'North', 'ลำปาง': 'North', 'ลำพูน': 'North',
+    'แม่ฮ่องสอน': 'North', 'น่าน': 'North', 'พะเยา': 'North', 'แพร่': 'North', 'อุตรดิตถ์': 'North', 'ตาก': 'North',
+    'สุโขทัย': 'North', 'พิษณุโลก': 'North', 'พิจิตร': 'North', 'กำแพงเพชร': 'North', 'เพชรบูรณ์': 'North',
+    'นครสวรรค์': 'North', 'อุทัยธานี': 'North', 'ขอนแก่น': 'Northeast', 'นครราชสีมา': 'Northeast', 'กาฬสินธุ์': 'Northeast',
+    'ชัยภูมิ': 'Northeast', 'นครพนม': 'Northeast', 'บึงกาฬ': 'Northeast', 'บุรีรัมย์': 'Northeast', 'มหาสารคาม': 'Northeast',
+    'มุกดาหาร': 'Northeast', 'ยโสธร': 'Northeast', 'ร้อยเอ็ด': 'Northeast', 'เลย': 'Northeast', 'ศรีสะเกษ': 'Northeast',
+    'สกลนคร': 'Northeast', 'สุรินทร์': 'Northeast', 'หนองคาย': 'Northeast', 'หนองบัวลำภู': 'Northeast', 'อำนาจเจริญ': 'Northeast',
+    'อุดรธานี': 'Northeast', 'อุบลราชธานี': 'Northeast', 'ชลบุรี': 'East', 'จันทบุรี': 'East', 'ฉะเชิงเทรา': 'East',
+    'ตราด': 'East', 'ปราจีนบุรี': 'East', 'ระยอง': 'East', 'สระแก้ว': 'East', 'กระบี่': 'South', 'ชุมพร': 'South',
+    'ตรัง': 'South', 'นครศรีธรรมราช': 'South', 'นราธิวาส': 'South', 'ปัตตานี': 'South', 'พังงา': 'South',
+    'พัทลุง': 'South', 'ภูเก็ต': 'South', 'ยะลา': 'South', 'ระนอง': 'South', 'สงขลา': 'South', 'สตูล': 'South',
+    'สุราษฎร์ธานี': 'South', 'ไม่ระบุ': 'Unspecified', 'อื่นๆ': 'Unspecified', 'Unknown': 'Unspecified',
+    None: 'Unspecified', '': 'Unspecified'
+}
+
+ms_occupation_map = {
+    'ข้าราชการ/พนักงานรัฐวิสาหกิจ': 'Government',
+    'พนักงานบริษัท': 'Professional',
+    'พนักงานบริษัท/ลูกจ้างเอกชน': 'Professional',
+    'พนักงานประจำโรงงาน': 'General_Labor',
+    'นักเรียน/นักศึกษา': 'Student',
+    'แม่บ้าน/พ่อบ้าน': 'Housewife',
+    'เกษตรกร/ประมง': 'General_Labor',
+    'รับจ้างทั่วไป': 'General_Labor',
+    'ไม่ได้ทำงาน/เกษียณ': 'Unemployed',
+    'ว่างงาน': 'Unemployed',
+    'ผู้ประกอบอาชีพอิสระ': 'Others',
+    'กลุ่มอาชีพ รายได้ไม่ประจำ เช่น \nฟรีแลนซ์ , อาชีพอิสระ': 'Others',
+    'อื่นๆ': 'Others',
+    'ไม่ระบุ': 'Unspecified',
+}
+
+ms_employment_map = {
+    'ทำงานเต็มเวลา (30 ชั่วโมงขึ้นไป/สัปดาห์)': 'Employed_Someone_Else_More_30_Hrs',
+    'ทำงานนอกเวลา (น้อยกว่า 30 ชั่วโมง/สัปดาห์)': 'Employed_Someone_Else_Less_30_Hrs',
+    'เจ้าของกิจการ/ทำงานอิสระ': 'Self_Employed',
+    'นักเรียน/นักศึกษา': 'Student',
+    'แม่บ้าน/พ่อบ้าน': 'Housewife',
+    'ว่างงาน/กำลังหางาน': 'Not_Employed_Looking',
+    'เกษียณ': 'Not_Employed_Other'
+}
+
+ms_cars_at_home_map = {
+    '0': '0', '1': '1', '2': '2', '3': '3_Or_More', '4': '3_Or_More',
+    '3 or more': '3_Or_More', 'ไม่มี': '0',
+    'ไม่ระบุ': 'Unspecified'
+}
+
+ms_car_owner_map = {
+    'ตนเอง': 'Yourself', 'คู่สมรส': 'Spouse', 'บิดา/มารดา': 'Parent', 'บุตร': 'Child',
+    'ปู่ย่า/ตายาย': 'Grandparents', 'พี่น้อง': 'Brothers_Sisters',
+    'อื่นๆ': 'Others', 'ไม่ทราบ': 'Dont_Know', 'ไม่มี': 'Dont_Know',
+    'ไม่ระบุ': 'Dont_Know'
+}
+
+ms_dimension_maps = {
+    'Gender': DimensionMap('Gender', ms_gender_map, 'Other'),
+    'Age': DimensionMap('Age', age_band_edges, 'Unspecified'),
+    'SES_Personal': DimensionMap('SES_Personal', map_ms_income_to_ses, 'Unspecified'),
+    'SES_Household': DimensionMap('SES_Household', map_ms_income_to_ses, 'Unspecified'),
+    'Occupation': DimensionMap('Occupation', ms_occupation_map, 'Unspecified'),
+    'Employment': DimensionMap('Employment', ms_employment_map, 'Unspecified'),
+    'Region': DimensionMap('Region', ms_province_to_region_map, 'Unspecified'),
+    'Cars': DimensionMap('Cars', ms_cars_at_home_map, 'Unspecified'),
+    'Car_Owner': DimensionMap('Car_Owner', ms_car_owner_map, 'Dont_Know'),
+}
+
+# --- 4. DS (Asian panel): ไฟล์สรุปจำนวนต่อ label ภาษาอังกฤษ ---
+ds_gender_map = {'Male': 'Male', 'Female': 'Female'}
+
+ds_age_mapping = {
+    '18-19': '18_19',
+    '20-29': '20_29',
+    '30-39': '30_39',
+    '40-49': '40_49',
+    '50-59': '50_59',
+    '60-69': '60_69',
+    '70-99': '70_99'
+}
+
+def map_ds_income_to_ses(income_range_str):
+    income_range_str = normalize_text(income_range_str)
+    if '150,000 thb or higher' in income_range_str or '100,000 thb or higher' in income_range_str:
+        return 'A'
+    elif '100,000 - 149,999 thb' in income_range_str or '75,000 - 99,999 thb' in income_range_str or '50,000 - 74,999 thb' in income_range_str or '50,000 - 99,999 thb' in income_range_str:
+        return 'B_Plus'
+    elif '30,000 - 49,999 thb' in income_range_str:
+        return 'B'
+    elif '20,000 - 29,999 thb' in income_range_str:
+        return 'C_Plus'
+    elif '10,000 - 19,999 thb' in income_range_str:
+        return 'C'
+    elif '5,000 - 9,999 thb' in income_range_str:
+        return 'D'
+    elif 'less than 5,000 thb' in income_range_str:
+        return 'E'
+    else:
+        return None  # ไม่ตรงกฎใดเลย -> ใช้ default ของ dimension และถูกบันทึกใน data-quality report
+
+ds_occupation_map = {
+    'Government worker (excluding Teacher)': 'Government',
+    'Teacher': 'Government',  # รวมกับ Government
+    'Official of association': 'Professional',
+    'Self-owned business (Commercial service)': 'Commercial_Service',
+    'Specialist (legal or management related, ex. lawyer, tax accountant)': 'Professional',
+    'Specialist (medical worker, ex. doctor)': 'Professional',
+    'Specialist (engineer, etc.)': 'General_Labor',
+    'Others': 'Others',
+    'Have not answered yet': 'Unspecified'
+}
+
+ds_employment_map = {
+    'Employed by someone else, working 30 hours or more per week': 'Employed_Someone_Else_More_30_Hrs',
+    'Employed part-time by someone else, working less than 30 hours per week': 'Employed_Someone_Else_Less_30_Hrs',
+    'Self-employed, working outside your home': 'Self_Employed',
+    'Self-employed, working in our home': 'Self_Employed',
+    'Middle school student': 'Student',
+    'High school student': 'Student',
+    'University student': 'Student',
+    'Graduate student': 'Student',
+    'Retired': 'Not_Employed_Other',
+    'Housewife': 'Housewife',
+    'Not currently employed': 'Not_Employed_Looking',
+    'Others': 'Not_Employed_Other',
+    'Have not answered yet': 'Unspecified'
+}
+
+ds_region_map = {
+    'Bangkok Metropolitan': 'Bangkok_Metropolitan',
+    'Sub-Central': 'Central',
+    'Northern': 'North',
+    'Northeastern': 'Northeast',
+    'Eastern': 'East',
+    'Western': 'West',
+    'Southern': 'South'
+}
+
+ds_cars_map = {
+    '0': '0',
+    '1': '1',
+    '2': '2',
+    '3 or more': '3_Or_More'
+}
+
+ds_car_owner_map = {
+    'Yourself': 'Yourself',
+    'Spouse': 'Spouse',
+    'Parent': 'Parent',
+    'Child': 'Child',
+    'Grand parents': 'Grandparents',
+    'Brothers and sisters': 'Brothers_Sisters',
+    'Others': 'Others',
+    "Don't Know": 'Dont_Know'
+}
+
+ds_dimension_maps = {
+    'Gender': DimensionMap('Gender', ds_gender_map),
+    'Age': DimensionMap('Age', ds_age_mapping),
+    'SES_Personal': DimensionMap('SES_Personal', map_ds_income_to_ses, 'Unspecified'),
+    'SES_Household': DimensionMap('SES_Household', map_ds_income_to_ses, 'Unspecified'),
+    'Occupation': DimensionMap('Occupation', ds_occupation_map, 'Unspecified'),
+    'Employment': DimensionMap('Employment', ds_employment_map, 'Unspecified'),
+    'Region': DimensionMap('Region', ds_region_map, 'Unspecified'),
+    'Cars': DimensionMap('Cars', ds_cars_map, 'Unspecified'),
+    'Car_Owner': DimensionMap('Car_Owner', ds_car_owner_map, 'Dont_Know'),
+}
+
+# --- 5. mapping tables + rules ที่ใช้เป็นส่วนหนึ่งของ cache key (แก้ mapping แล้ว cache จะถูก invalidate เอง) ---
+# รวม engine ที่คำนวณ codes/counts (category_codes ทั้ง module) และ common_model_row ด้วย
+# ฟังก์ชัน encode ของแต่ละ processor ถูกเพิ่มใน mapping_tables ของ adapter (process_ms_data.py / process_ds_data.py)
+ms_mapping_tables = [
+    ms_gender_map, age_band_edges, map_ms_income_to_ses, ms_province_to_region_map, ms_occupation_map,
+    ms_employment_map, ms_cars_at_home_map, ms_car_owner_map, common_dimensions, DimensionMap, normalize_text,
+    category_codes, common_model_row
+]
+ds_mapping_tables = [
+    ds_gender_map, ds_age_mapping, map_ds_income_to_ses, ds_occupation_map, ds_employment_map, ds_region_map,
+    ds_cars_map, ds_car_owner_map, common_dimensions, DimensionMap, normalize_text, category_codes, common_model_row
+]
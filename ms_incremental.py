@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+import bitmap_index
+import data_quality
+import panel_cache
+import respondent_cube
+from category_codes import count_codes
+from csv_shards import read_record_range
+from panel_io import file_format, read_text_columns
+from process_ms_data import (
+    ms_data_folder, ms_column_rename, ms_dimensions, ms_dimension_categories, ms_mapping_tables,
+    encode_ms_chunk, ms_input_path, build_ms_summary,
+)
+
+# --- Incremental ingest ของ MS: ไฟล์ MS ของเดือนเป็น cumulative extract ที่โตขึ้นเรื่อย ๆ ---
+# state เก็บอยู่ใน respondent cube ของเดือนนั้น (processed_data/ms_codes/YYYYMM/):
+#   Respondent_ID + codes ต่อ dimension, ID_Sorted.npy / ID_Order.npy (sorted ID index),
+#   state.json (running counts ต่อ category, ค่าดิบที่ map ไม่ได้, ขนาดไฟล์และ hash ของไฟล์ที่อ่านไปแล้ว, hash ของ mapping)
+# รอบถัดไป:
+#   - ไฟล์แค่ต่อท้าย (prefix เดิม) -> parse เฉพาะ bytes ที่เพิ่มขึ้น
+#   - ไฟล์ถูกเขียนใหม่ -> parse ทั้งไฟล์ แล้ว diff กับ state (รวมถึง respondent ที่หายไป)
+#   respondent ใหม่ -> บวกเข้า counts, respondent เดิมที่ attribute เปลี่ยน -> ลบ code เก่าแล้วบวก code ใหม่
+# 1 Respondent_ID นับ 1 ครั้ง (ถ้า ID ซ้ำ ใช้แถวล่าสุด) ถ้า ID ไม่ซ้ำกันผลจะเท่ากับ process_ms_month ทุกประการ
+# ตัวอย่าง: python ms_incremental.py 2025-06
+
+
+def _prefix_digest(path, size, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = size
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _is_append(path, state, file_size):
+    # ไฟล์เดิมต้องจบที่ขึ้นบรรทัดใหม่ และ bytes ช่วงแรกต้องเหมือนเดิมทุก byte
+    known_size = state['source_size']
+    if known_size == 0 or file_size < known_size:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(known_size - 1)
+        if f.read(1) != b'\n':
+            return False
+    return _prefix_digest(path, known_size) == state['source_sha256']
+
+
+def _read_extract(path, start, end):
+    # อ่านเป็นข้อความ: ค่าดิบเหมือนกันไม่ว่าจะ parse ทั้งไฟล์หรือแค่ส่วนท้าย (pandas ไม่เดา dtype ต่างกันตามช่วงที่อ่าน)
+    usecols = list(ms_column_rename)
+    if start == 0:
+        return read_text_columns(path, usecols)
+    with open(path, 'rb') as f:
+        header = f.readline()
+    return read_record_range(path, header, start, end, usecols)
+
+
+def _encode_extract(df):
+    # คืน (ids, codes, unmapped) โดย unmapped นับจากทุกแถวที่อ่าน (เหมือน process_ms_month)
+    df = df.rename(columns=ms_column_rename)
+    ids = respondent_cube.encode_respondent_ids(df['Respondent_ID'])
+    value_memo = panel_cache.load_value_memo('MS', ms_mapping_tables)
+    known_values = sum(len(values) for values in value_memo.values())
+    unmapped = {}
+    codes = encode_ms_chunk(df, value_memo, unmapped)
+    if sum(len(values) for values in value_memo.values()) > known_values:
+        panel_cache.save_value_memo('MS', ms_mapping_tables, value_memo)
+    # ID ซ้ำ -> เก็บแถวสุดท้ายของแต่ละ ID (ตามลำดับในไฟล์)
+    _, last_from_end = np.unique(ids[::-1], return_index=True)
+    keep = np.sort(len(ids) - 1 - last_from_end)
+    if len(keep) == len(ids):
+        return ids, codes, unmapped
+    return ids[keep], {dim: dim_codes[keep] for dim, dim_codes in codes.items()}, unmapped
+
+
+def _add_unmapped(running, unmapped):
+    # running counts ของค่าดิบที่ map ไม่ได้ (จาก state) + ของส่วนที่เพิ่งอ่าน
+    merged = {dim: dict(values) for dim, values in running.items()}
+    for dim, values in unmapped.items():
+        dim_values = merged.setdefault(dim, {})
+        for value, count in values.items():
+            dim_values[value] = dim_values.get(value, 0) + count
+    return merged
+
+
+def _bincounts(codes, rows=slice(None)):
+    return {dim: count_codes(dim_codes[rows], ms_dimension_categories[dim]) for dim, dim_codes in codes.items()}
+
+
+def _apply_changes(cube_ids, cube_codes, id_sorted, id_order, totals, ids, codes, full_extract):
+    # จับคู่ ID ที่เข้ามากับ sorted ID index ด้วย searchsorted (ไม่ต้องเรียง/เทียบทั้ง cube ใหม่)
+    positions = np.minimum(np.searchsorted(id_sorted, ids), max(len(id_sorted) - 1, 0))
+    found = id_sorted[positions] == ids if len(id_sorted) else np.zeros(len(ids), dtype=bool)
+    matched_rows = id_order[positions[found]]
+
+    changed = np.zeros(int(found.sum()), dtype=bool)
+    for dim in cube_codes:
+        changed |= cube_codes[dim][matched_rows] != codes[dim][found]
+    changed_rows = matched_rows[changed]
+    for dim in cube_codes:
+        incoming = codes[dim][found][changed]
+        totals[dim] -= count_codes(cube_codes[dim][changed_rows], ms_dimension_categories[dim])
+        totals[dim] += count_codes(incoming, ms_dimension_categories[dim])
+        cube_codes[dim][changed_rows] = incoming
+
+    # อ่านทั้งไฟล์ -> respondent ที่ไม่อยู่ในไฟล์แล้วต้องถูกหักออก
+    removed = 0
+    if full_extract:
+        keep = np.ones(len(cube_ids), dtype=bool)
+        keep[matched_rows] = False
+        drop_rows = np.flatnonzero(keep)
+        removed = len(drop_rows)
+        if removed:
+            for dim, counts in _bincounts(cube_codes, drop_rows).items():
+                totals[dim] -= counts
+            keep = np.ones(len(cube_ids), dtype=bool)
+            keep[drop_rows] = False
+            cube_ids = cube_ids[keep]
+            cube_codes = {dim: dim_codes[keep] for dim, dim_codes in cube_codes.items()}
+
+    new = ~found
+    for dim, counts in _bincounts(codes, new).items():
+        totals[dim] += counts
+    cube_ids = np.concatenate([cube_ids, ids[new]])
+    cube_codes = {dim: np.concatenate([cube_codes[dim], codes[dim][new]]) for dim in cube_codes}
+
+    if removed:
+        id_order = np.argsort(cube_ids, kind='stable')
+        id_sorted = cube_ids[id_order]
+    else:
+        # merge ID ใหม่ (ที่เรียงแล้ว) เข้า sorted index เดิม
+        new_ids = ids[new]
+        new_order = np.argsort(new_ids, kind='stable')
+        new_rows = len(cube_ids) - len(new_ids) + new_order
+        insert_at = np.searchsorted(id_sorted, new_ids[new_order])
+        id_sorted = np.insert(id_sorted, insert_at, new_ids[new_order])
+        id_order = np.insert(id_order, insert_at, new_rows)
+
+    stats = {'new': int(new.sum()), 'changed': int(changed.sum()), 'removed': removed}
+    return cube_ids, cube_codes, id_sorted, id_order, stats
+
+
+def ingest_ms_month(current_month, ms_data_folder=ms_data_folder):
+    month_code = current_month.replace('-', '')[:6]
+    ms_file_path = ms_input_path(ms_data_folder, month_code)
+    cube_dir = respondent_cube.cube_path(month_code)
+    file_size = os.path.getsize(ms_file_path)
+    mappings = panel_cache.mapping_digest(ms_mapping_tables)
+
+    state = respondent_cube.load_state(cube_dir) if respondent_cube.cube_is_current(cube_dir) else None
+    if state is None or state.get('mappings') != mappings:
+        # ยังไม่มี state, cube encode ID ด้วยวิธีเก่า หรือ mapping เปลี่ยน -> เริ่มจากศูนย์
+        cube_ids = np.empty(0, dtype=np.int64)
+        cube_codes = {dim: np.empty(0, dtype=np.int8) for dim in ms_dimensions}
+        id_sorted, id_order = cube_ids, np.empty(0, dtype=np.intp)
+        totals = {dim: np.zeros(len(categories), dtype=np.int64) for dim, categories in ms_dimension_categories.items()}
+        start = 0
+    else:
+        cube = respondent_cube.RespondentCube.load(cube_dir, mmap=False)
+        cube_ids, cube_codes = cube.respondent_ids, cube.codes
+        id_sorted, id_order = np.asarray(cube.id_sorted), np.asarray(cube.id_order)
+        totals = {dim: np.array(counts, dtype=np.int64) for dim, counts in state['totals'].items()}
+        # ต่อท้ายได้เฉพาะ CSV (Parquet/Feather ถูกเขียนใหม่ทั้งไฟล์ทุกครั้ง)
+        appended = file_format(ms_file_path) == 'csv' and _is_append(ms_file_path, state, file_size)
+        start = state['source_size'] if appended else 0
+
+    ids, codes, unmapped = _encode_extract(_read_extract(ms_file_path, start, file_size))
+    if start:
+        # ส่วนต่อท้าย: บวกเข้ากับค่าดิบที่ map ไม่ได้ของรอบก่อน ๆ (respondent ที่ถูกแก้ในส่วนต่อท้ายนับทั้งแถวเก่าและใหม่
+        # จนกว่าจะมีรอบที่อ่านทั้งไฟล์ ซึ่งนับใหม่ทั้งหมด)
+        unmapped = _add_unmapped(state.get('unmapped', {}), unmapped)
+    cube_ids, cube_codes, id_sorted, id_order, stats = _apply_changes(
+        cube_ids, cube_codes, id_sorted, id_order, totals, ids, codes, full_extract=start == 0)
+    mode = 'appended rows' if start else 'full extract'
+    print(f"MS incremental ({month_code}, {mode}): {stats['new']:,} new, "
+          f"{stats['changed']:,} changed, {stats['removed']:,} removed, {len(cube_ids):,} respondents")
+
+    state = {
+        'source_size': file_size,
+        'source_sha256': _prefix_digest(ms_file_path, file_size),
+        'mappings': mappings,
+        'totals': {dim: counts.tolist() for dim, counts in totals.items()},
+        'unmapped': unmapped,
+    }
+    respondent_cube.save_cube(cube_dir, cube_codes, ms_dimension_categories, cube_ids,
+                              extra_arrays={'ID_Sorted': id_sorted, 'ID_Order': id_order}, state=state)
+    bitmap_index.save_bitmap_index(bitmap_index.bitmap_path(month_code), cube_codes, ms_dimension_categories)
+
+    ms_counts = {dim: pd.Series(totals[dim], index=categories) for dim, categories in ms_dimension_categories.items()}
+    df_ms_result = build_ms_summary(current_month, ms_counts, len(cube_ids))
+    data_quality.write_quality_report('MS', current_month, df_ms_result, unmapped)
+    return df_ms_result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incrementally update the MS summary for one month from its cumulative extract.')
+    parser.add_argument('month', help='month to process, e.g. 2025-06')
+    args = parser.parse_args()
+
+    df_ms_result = ingest_ms_month(pd.to_datetime(args.month).strftime('%Y-%m-%d'))
+    print("\nMS Monthly Summary (Preview):")
+    print(df_ms_result.transpose())
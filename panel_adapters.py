@@ -0,0 +1,114 @@
+import abc
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+import data_quality
+import mapping_registry
+import panel_cache
+
+# --- Panel adapters: 1 vendor panel = 1 adapter (ไฟล์ input ของเดือน -> 1 แถวตาม common model) ---
+# adapter อยู่ในโมดูลของ panel นั้นเอง (เช่น process_ds_data.DSAdapter) และลงทะเบียนด้วย register_adapter ตอน import
+# เพิ่ม panel ใหม่: เพิ่ม DimensionMap ของ panel ใน mapping_registry.py, เขียนโมดูลที่มี adapter แล้วเพิ่มชื่อโมดูลใน adapter_modules
+#   TableAdapter: panel ที่อ่านข้อมูลทั้งเดือนเข้าหน่วยความจำได้ (เช่น DS) -> implement input_paths / load / normalize
+#   PanelAdapter: panel ที่ต้องอ่านแบบ streaming (เช่น MS อ่านทีละ chunk/shard) -> implement input_paths / compute_month เอง
+#   runner, backfill, combine และ dashboard จะเห็น panel ใหม่เองโดยไม่ต้องแก้
+# run_adapters() รันทุก panel พร้อมกันคนละ process -> เวลารวมใกล้เคียง panel ที่ช้าที่สุด ไม่ใช่ผลรวมของทุก panel
+
+adapter_modules = ['process_ms_data', 'process_ds_data']
+
+_adapters = {}
+
+
+class PanelAdapter(abc.ABC):
+    panel = None          # ค่า Panel_Source ใน summary
+    display_name = None   # ชื่อที่แสดงใน dashboard
+    icon = '📋'
+    color = None          # สีใน chart (None = สีตาม plotly)
+    dimension_maps = {}   # dimension -> mapping_registry.DimensionMap ของ panel นี้
+    mapping_tables = []   # mapping/rules ที่เป็นส่วนหนึ่งของ cache key
+
+    @abc.abstractmethod
+    def input_paths(self, current_month):
+        # ไฟล์ input ของเดือนนั้น (ใช้เป็น cache key)
+        ...
+
+    @abc.abstractmethod
+    def compute_month(self, current_month, **options):
+        # ประมวลผลเดือนนั้นจากไฟล์ input -> DataFrame 1 แถวตาม common model (และเขียน data-quality report)
+        ...
+
+    def aggregate(self, current_month, total, counts):
+        return mapping_registry.common_model_row(self.panel, current_month, total, counts, self.dimension_maps)
+
+    def process_month(self, current_month, use_cache=True, **options):
+        # ผลลัพธ์ถูก cache ตาม hash ของไฟล์ input + mapping (ดู panel_cache.py)
+        if not use_cache:
+            return self.compute_month(current_month, **options)
+        return panel_cache.cached_result(
+            self.panel, current_month, self.input_paths(current_month), self.mapping_tables,
+            lambda: self.compute_month(current_month, **options))
+
+
+class TableAdapter(PanelAdapter):
+    # ข้อมูลทั้งเดือนอยู่ในหน่วยความจำได้: compute_month = load -> normalize -> aggregate
+
+    @abc.abstractmethod
+    def load(self, current_month):
+        # อ่านข้อมูลดิบของเดือนนั้น (FileNotFoundError ถ้าไม่มีไฟล์)
+        ...
+
+    @abc.abstractmethod
+    def normalize(self, loaded):
+        # ข้อมูลดิบ -> (Total_Respondents_Count, {dimension: จำนวนต่อ category ตาม dimension_maps}, {dimension: {ค่าดิบที่ map ไม่ได้: จำนวน}})
+        ...
+
+    def compute_month(self, current_month, **options):
+        total, counts, unmapped = self.normalize(self.load(current_month))
+        df_result = self.aggregate(current_month, total, counts)
+        data_quality.write_quality_report(self.panel, current_month, df_result, unmapped)
+        return df_result
+
+
+def register_adapter(adapter):
+    _adapters[adapter.panel] = adapter
+    return adapter
+
+
+def load_adapters():
+    for module_name in adapter_modules:
+        importlib.import_module(module_name)
+    return dict(_adapters)
+
+
+def get_adapter(panel):
+    return load_adapters()[panel]
+
+
+def registered_panels():
+    return list(load_adapters())
+
+
+def panel_labels():
+    # Panel_Source -> ชื่อที่แสดง (panel ที่ไม่มี adapter แสดงเป็นรหัสเดิม)
+    return {panel: adapter.display_name or panel for panel, adapter in load_adapters().items()}
+
+
+def panel_colors():
+    return {adapter.display_name or panel: adapter.color for panel, adapter in load_adapters().items() if adapter.color}
+
+
+def process_panel(panel, current_month, options=None):
+    # top-level function เพื่อให้ส่งเข้า process pool ได้ (adapter ถูกโหลดใหม่ใน worker process)
+    return get_adapter(panel).process_month(current_month, **(options or {}))
+
+
+def run_adapters(current_month, panels=None, panel_options=None):
+    # รันทุก panel พร้อมกัน -> {panel: DataFrame 1 แถว} ตามลำดับ panels
+    # panel_options: panel -> kwargs ของ process_month (เช่น {'MS': {'workers': 32, 'incremental': True}})
+    panels = registered_panels() if panels is None else list(panels)
+    panel_options = panel_options or {}
+    if len(panels) <= 1:
+        return {panel: process_panel(panel, current_month, panel_options.get(panel)) for panel in panels}
+    with ProcessPoolExecutor(max_workers=len(panels)) as pool:
+        futures = {panel: pool.submit(process_panel, panel, current_month, panel_options.get(panel)) for panel in panels}
+        return {panel: future.result() for panel, future in futures.items()}
@@ -0,0 +1,134 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+
+import data_quality
+
+# --- Cache ผลลัพธ์ต่อ (panel, month) โดยใช้ content hash ของไฟล์ดิบ + hash ของ mapping tables ---
+# ถ้าไฟล์ดิบและ mapping ไม่เปลี่ยน จะคืนผลลัพธ์ที่เก็บไว้ทันทีโดยไม่ประมวลผลใหม่
+# แต่ละ (panel, month) มี manifest ของตัวเอง (<PANEL>_<YYYYMM>.json + .pkl) จึงรันหลาย process พร้อมกันได้
+# data-quality report ของผลลัพธ์เก็บคู่กันไว้ (<PANEL>_<YYYYMM>_quality.json) และถูกเขียนกลับลง quality folder ทุกครั้งที่ cache hit
+# cache_version: เพิ่มเมื่อรูปแบบผลลัพธ์หรือโค้ดที่ไม่อยู่ใน mapping_tables เปลี่ยน (cache เดิมทั้งหมดจะไม่ถูกใช้)
+
+cache_folder = './processed_data/cache/'
+cache_version = 3
+
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def mapping_digest(mapping_objects):
+    # dict -> repr ของ items ที่เรียงแล้ว (key บางตัวเป็น None), list -> repr
+    # ฟังก์ชัน/class (เช่น SES rules, encode ของ processor) และ module (เช่น category_codes) -> source code
+    digest = hashlib.sha256()
+    for obj in mapping_objects:
+        if callable(obj) or inspect.ismodule(obj):
+            digest.update(inspect.getsource(obj).encode('utf-8'))
+        elif isinstance(obj, dict):
+            digest.update(repr(sorted(obj.items(), key=repr)).encode('utf-8'))
+        else:
+            digest.update(repr(obj).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _input_fingerprints(input_paths, previous):
+    # ใช้ hash เดิมถ้า size และ mtime ของไฟล์ไม่เปลี่ยน (ไม่ต้องอ่านไฟล์ใหญ่ซ้ำทุกคืน)
+    fingerprints = {}
+    for path in input_paths:
+        stat = os.stat(path)
+        known = previous.get(path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            sha256 = known['sha256']
+        else:
+            sha256 = file_digest(path)
+        fingerprints[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    return fingerprints
+
+
+def _atomic_dump(path, dump, mode):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+    try:
+        with os.fdopen(fd, mode) as f:
+            dump(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def cached_result(panel, current_month, input_paths, mapping_objects, compute):
+    # ไฟล์ดิบไม่ครบ -> ปล่อยให้ compute แจ้ง error ตามปกติ
+    if not all(os.path.exists(path) for path in input_paths):
+        return compute()
+
+    month_code = current_month.replace('-', '')[:6]
+    manifest_path = os.path.join(cache_folder, f'{panel}_{month_code}.json')
+    result_path = os.path.join(cache_folder, f'{panel}_{month_code}.pkl')
+    report_path = os.path.join(cache_folder, f'{panel}_{month_code}_quality.json')
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    inputs = _input_fingerprints(input_paths, manifest.get('inputs', {}))
+    mappings = mapping_digest(mapping_objects)
+    input_hashes = {path: fingerprint['sha256'] for path, fingerprint in inputs.items()}
+    previous_hashes = {path: fingerprint['sha256'] for path, fingerprint in manifest.get('inputs', {}).items()}
+
+    def write_manifest():
+        manifest_json = json.dumps({'version': cache_version, 'inputs': inputs, 'mappings': mappings}, indent=2)
+        _atomic_dump(manifest_path, lambda f: f.write(manifest_json), 'w')
+
+    if (manifest.get('version') == cache_version and input_hashes == previous_hashes and manifest.get('mappings') == mappings
+            and os.path.exists(result_path) and os.path.exists(report_path)):
+        print(f"Cache hit: {panel} {month_code} (inputs and mappings unchanged)")
+        with open(result_path, 'rb') as f:
+            result = pickle.load(f)
+        with open(report_path, encoding='utf-8') as f:
+            data_quality.save_quality_report(json.load(f))
+        if inputs != manifest['inputs']:
+            write_manifest()  # เนื้อหาเดิมแต่ mtime เปลี่ยน -> จำ stat ใหม่ไว้
+        return result
+
+    result = compute()
+    if not os.path.exists(cache_folder):
+        os.makedirs(cache_folder, exist_ok=True)
+    _atomic_dump(result_path, lambda f: pickle.dump(result, f), 'wb')
+    # compute เขียน report ไว้ใน quality folder แล้ว -> เก็บสำเนาไว้ใช้ตอน cache hit
+    report = data_quality.load_quality_report(panel, current_month)
+    if report is not None:
+        report_json = json.dumps(report, ensure_ascii=False, indent=1)
+        _atomic_dump(report_path, lambda f: f.write(report_json), 'w')
+    write_manifest()
+    return result
+
+
+def _value_memo_path(panel):
+    return os.path.join(cache_folder, f'{panel}_value_categories.json')
+
+
+def load_value_memo(panel, mapping_objects):
+    # memo ค่าดิบ -> category ต่อ dimension ใช้ร่วมกันทุกเดือน (mapping เปลี่ยน -> เริ่ม memo ใหม่)
+    try:
+        with open(_value_memo_path(panel), encoding='utf-8') as f:
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return stored['dimensions'] if stored.get('mappings') == mapping_digest(mapping_objects) else {}
+
+
+def save_value_memo(panel, mapping_objects, memo):
+    if not os.path.exists(cache_folder):
+        os.makedirs(cache_folder, exist_ok=True)
+    memo_json = json.dumps({'mappings': mapping_digest(mapping_objects), 'dimensions': memo}, indent=1)
+    _atomic_dump(_value_memo_path(panel), lambda f: f.write(memo_json), 'w')
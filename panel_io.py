@@ -0,0 +1,162 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as pa_feather
+    import pyarrow.parquet as pa_parquet
+except ImportError:  # pyarrow เป็น optional: ถ้าไม่มีจะอ่านได้เฉพาะ CSV ด้วย engine ปกติของ pandas
+    pa = None
+
+# --- อ่านไฟล์ input ของ panel: Parquet / Feather / CSV เลือกตามนามสกุลไฟล์ ---
+# ถ้าไฟล์เดือนเดียวกันมีหลายแบบ จะใช้ตามลำดับใน input_extensions (Parquet ก่อน เพราะ upstream export เป็น Parquet อยู่แล้ว)
+# read_text_columns / iter_text_chunks (MS): อ่านเฉพาะคอลัมน์ที่ระบุ เป็นข้อความแบบ dictionary-encoded (pandas Categorical)
+#   ค่าที่ได้เหมือนกับ pd.read_csv(dtype=str) แต่ใช้หน่วยความจำน้อยกว่ามาก และ factorize ได้เร็ว
+# CSV ใช้ pyarrow CSV reader ถ้ามี pyarrow ไม่งั้นใช้ pd.read_csv ตามเดิม
+#   ทั้งไฟล์: read_csv (multi-thread), ทีละ chunk: open_csv (streaming ทีละ block), ช่วง byte ของ csv_shards: read_csv_text
+
+input_extensions = ['.parquet', '.feather', '.csv']
+
+# ค่า NA ชุดเดียวกับ default ของ pd.read_csv (pyarrow ไม่มี '<NA>' และ 'None')
+csv_na_values = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+# bytes ต่อ block ของ open_csv ตอน streaming: pyarrow อ่านล่วงหน้าหลาย block (~30 block) จึงใช้ block เล็ก
+# หน่วยความจำ ~ chunk_size แถว + block ที่อ่านล่วงหน้า ไม่ขึ้นกับขนาดไฟล์
+csv_block_size = 1 << 19
+
+
+def find_input(path_without_extension):
+    # คืนไฟล์แรกที่มีอยู่จริงตามลำดับ input_extensions (ไม่มีเลย -> ชื่อ .csv เพื่อให้ error บอก path เดิม)
+    for extension in input_extensions:
+        if os.path.exists(path_without_extension + extension):
+            return path_without_extension + extension
+    return path_without_extension + '.csv'
+
+
+def file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}.get(extension, 'csv')
+
+
+def _require_pyarrow(path):
+    if pa is None:
+        raise ImportError(f"Reading {path} requires pyarrow (pip install pyarrow), or provide a CSV export instead.")
+
+
+def input_columns(path):
+    fmt = file_format(path)
+    if fmt == 'parquet':
+        _require_pyarrow(path)
+        return pa_parquet.read_schema(path).names
+    if fmt == 'feather':
+        _require_pyarrow(path)
+        return pa_feather.read_table(path, memory_map=True).schema.names
+    return list(pd.read_csv(path, encoding='utf-8', nrows=0).columns)
+
+
+def _as_text(column):
+    # คอลัมน์ typed (เช่น อายุเป็น int/float ใน Parquet) -> ข้อความแบบที่ CSV เขียนไว้ (45 ไม่ใช่ '45.0')
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories
+        if categories.dtype == object or pd.api.types.is_string_dtype(categories):
+            return column
+        column = column.astype(categories.dtype)
+    if pd.api.types.is_float_dtype(column) and (column.dropna() % 1 == 0).all():
+        column = column.astype('Int64')
+    if not (column.dtype == object or pd.api.types.is_string_dtype(column)):
+        column = column.astype(str).where(column.notna())
+    return column.astype('category')
+
+
+def _csv_text_options(columns):
+    # คำตอบบางช่องมีขึ้นบรรทัดใหม่ใน "..." -> ต้องเปิด newlines_in_values
+    return {
+        'parse_options': pa_csv.ParseOptions(newlines_in_values=True),
+        'convert_options': pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.dictionary(pa.int32(), pa.string()) for col in columns},
+            null_values=csv_na_values, strings_can_be_null=True,
+        ),
+    }
+
+
+def _text_frame(table, columns):
+    df = table.to_pandas()
+    return pd.DataFrame({col: _as_text(df[col]) for col in columns})
+
+
+def read_csv_text(source, columns, use_threads=True):
+    # CSV (path หรือ file-like) -> เฉพาะ columns เป็นข้อความ (Categorical)
+    # use_threads=False สำหรับ worker process ของ csv_shards (ขนานกันระดับ process อยู่แล้ว)
+    if pa is None:
+        return pd.read_csv(source, encoding='utf-8', usecols=columns, dtype='category')
+    read_options = pa_csv.ReadOptions(use_threads=use_threads)
+    return _text_frame(pa_csv.read_csv(source, read_options=read_options, **_csv_text_options(columns)), columns)
+
+
+def read_text_columns(path, columns):
+    # MS: อ่านเฉพาะ columns เป็นข้อความ (Categorical)
+    fmt = file_format(path)
+    if fmt == 'csv':
+        return read_csv_text(path, columns)
+    _require_pyarrow(path)
+    if fmt == 'parquet':
+        table = pa_parquet.read_table(path, columns=columns, read_dictionary=columns)
+    else:
+        table = pa_feather.read_table(path, columns=columns, memory_map=True)
+    return _text_frame(table, columns)
+
+
+def _rechunk(batches, chunk_size):
+    # record batch ของ open_csv มีขนาดตาม block (bytes) -> table ละ chunk_size แถว ตามลำดับในไฟล์
+    pending, pending_rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunk_size)
+            rest = table.slice(chunk_size)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending)
+
+
+def iter_text_chunks(path, columns, chunk_size):
+    # อ่านทีละ chunk_size แถว (หน่วยความจำคงที่)
+    fmt = file_format(path)
+    if fmt == 'parquet':
+        _require_pyarrow(path)
+        for batch in pa_parquet.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield _text_frame(batch, columns)
+    elif fmt == 'feather':
+        df = read_text_columns(path, columns)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    elif pa is None:
+        yield from pd.read_csv(path, encoding='utf-8', usecols=columns, dtype='category', chunksize=chunk_size)
+    else:
+        reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=csv_block_size), **_csv_text_options(columns))
+        for table in _rechunk(reader, chunk_size):
+            yield _text_frame(table, columns)
+
+
+def read_table(path):
+    # DS: ไฟล์เล็ก อ่านทั้งไฟล์ตาม dtype เดิม (Count เป็นตัวเลข)
+    fmt = file_format(path)
+    if fmt == 'parquet':
+        _require_pyarrow(path)
+        return pa_parquet.read_table(path).to_pandas()
+    if fmt == 'feather':
+        _require_pyarrow(path)
+        return pa_feather.read_table(path).to_pandas()
+    if pa is None:
+        return pd.read_csv(path, encoding='utf-8')
+    return pa_csv.read_csv(
+        path, convert_options=pa_csv.ConvertOptions(null_values=csv_na_values, strings_can_be_null=True)
+    ).to_pandas()
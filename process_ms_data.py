@@ -1,248 +1,202 @@
 import pandas as pd
 import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import panel_cache
+import respondent_cube
+import bitmap_index
+import data_quality
+import mapping_registry
+import panel_adapters
+from category_codes import count_codes
+from csv_shards import split_records, read_record_range
+from panel_io import find_input, file_format, input_columns, read_text_columns, iter_text_chunks
 
 # --- 0. ตั้งค่าพื้นฐาน (ปรับค่าเหล่านี้ทุกเดือน) ---
 current_month = '2025-05-01' # ตัวอย่าง: May 2025. คุณจะเปลี่ยนเป็น 2025-06-01, 2025-07-01, ...
 ms_data_folder = './data/ms_data/' # โฟลเดอร์ที่เก็บไฟล์ MS (แก้ไขให้ตรงกับตำแหน่งไฟล์ของคุณ)
 processed_data_folder = './processed_data/' # โฟลเดอร์สำหรับเก็บผลลัพธ์ (แก้ไขให้ตรงกับตำแหน่งไฟล์ของคุณ)
-ms_file_name = f"ms_data_202505.csv" # ชื่อไฟล์ MS ที่คุณเตรียมไว้
-
-
-# --- 1. เตรียม Common Data Model Columns ทั้งหมด (จาก CSV Template ที่คุณสร้างไว้) ---
-all_common_data_model_columns = [
-    "Panel_Source", "Collected_Month", "Total_Respondents_Count", "Gender_Male_Count", "Gender_Female_Count",
-    "Age_18_19_Count", "Age_20_29_Count", "Age_30_39_Count", "Age_40_49_Count", "Age_50_59_Count",
-    "Age_60_69_Count", "Age_70_99_Count",
-    "SES_Personal_A_Count", "SES_Personal_B_Plus_Count", "SES_Personal_B_Count", "SES_Personal_C_Plus_Count",
-    "SES_Personal_C_Count", "SES_Personal_D_Count", "SES_Personal_E_Count", "SES_Personal_Unspecified_Count",
-    "SES_Household_A_Count", "SES_Household_B_Plus_Count", "SES_Household_B_Count", "SES_Household_C_Plus_Count",
-    "SES_Household_C_Count", "SES_Household_D_Count", "SES_Household_E_Count", "SES_Household_Unspecified_Count",
-    "Occupation_Government_Count", "Occupation_Professional_Count", "Occupation_Commercial_Service_Count",
-    "Occupation_Student_Count", "Occupation_General_Labor_Count", "Occupation_Unemployed_Count",
-    "Occupation_Housewife_Count", "Occupation_Others_Count", "Occupation_Unspecified_Count",
-    "Employment_Employed_Someone_Else_More_30_Hrs_Count", "Employment_Employed_Someone_Else_Less_30_Hrs_Count",
-    "Employment_Self_Employed_Count", "Employment_Not_Employed_Looking_Count", "Employment_Student_Count",
-    "Employment_Housewife_Count", "Employment_Not_Employed_Other_Count", "Employment_Unspecified_Count",
-    "Region_Bangkok_Metropolitan_Count", "Region_Central_Count", "Region_Northeast_Count", "Region_North_Count",
-    "Region_East_Count", "Region_West_Count", "Region_South_Count", "Region_Unspecified_Count",
-    "Cars_At_Home_0_Count", "Cars_At_Home_1_Count", "Cars_At_Home_2_Count", "Cars_At_Home_3_Or_More_Count",
-    "Cars_At_Home_Unspecified_Count",
-    "Car_Owner_Yourself_Count", "Car_Owner_Spouse_Count", "Car_Owner_Parent_Count", "Car_Owner_Child_Count",
-    "Car_Owner_Grandparents_Count", "Car_Owner_Brothers_Sisters_Count", "Car_Owner_Others_Count", "Car_Owner_Dont_Know_Count"
-]
-
-# --- 2. ฟังก์ชันและ Mapping สำหรับ Data Transformation (กำหนดครั้งเดียว) ---
-
-def map_income_range_to_ses(income_range_str):
-    income_range_str = str(income_range_str).lower().strip()
-    if '100,000 thb or higher' in income_range_str or '100,000 - 200,000 thb' in income_range_str or '200,001 - 300,000 thb' in income_range_str:
-        return 'A'
-    elif '50,000 - 99,999 thb' in income_range_str or '50,001 - 75,000 thb' in income_range_str or '70,000 - 79,999 thb' in income_range_str or '60,000 - 69,999 thb' in income_range_str:
-        return 'B+'
-    elif '30,000 - 49,999 thb' in income_range_str or '40,000 - 49,999 thb' in income_range_str:
-        return 'B'
-    elif '20,000 - 29,999 thb' in income_range_str:
-        return 'C+'
-    elif '10,000 - 19,999 thb' in income_range_str or '10,000 - 14,999 thb' in income_range_str:
-        return 'C'
-    elif '5,000 - 9,999 thb' in income_range_str or '<10,000 thb' in income_range_str:
-        return 'D'
-    elif 'less than 5,000 thb' in income_range_str:
-        return 'E'
-    elif 'don\'t know' in income_range_str or 'i do not want to answer' in income_range_str or 'have not answered yet' in income_range_str or pd.isna(income_range_str) or 'ไม่ระบุ' in income_range_str or 'nan' in income_range_str:
-        return 'Unspecified'
-    else:
-        return 'Unspecified'
+ms_chunk_size = None # ตั้งเป็นจำนวนแถว เช่น 500_000 เพื่ออ่านแบบ streaming (หน่วยความจำคงที่ไม่ว่าไฟล์จะใหญ่แค่ไหน)
+ms_workers = 1 # จำนวน process ที่ใช้ประมวลผลไฟล์ MS เดือนเดียว (เช่น 32 บนเครื่อง batch) ถ้า > 1 จะไม่ใช้ ms_chunk_size
 
-def map_ms_age_to_ds_standard(age):
-    try:
-        age = int(age)
-    except (ValueError, TypeError):
-        return 'Unspecified'
-
-    if 18 <= age <= 19:
-        return '18_19'
-    elif 20 <= age <= 29:
-        return '20_29'
-    elif 30 <= age <= 39:
-        return '30_39'
-    elif 40 <= age <= 49:
-        return '40_49'
-    elif 50 <= age <= 59:
-        return '50_59'
-    elif 60 <= age <= 69:
-        return '60_69'
-    elif 70 <= age <= 99:
-        return '70_99'
-    else:
-        return 'Unspecified'
-
-province_to_region_map = {
-    'กรุงเทพมหานคร': 'Bangkok_Metropolitan', 'สมุทรปราการ': 'Bangkok_Metropolitan', 'นนทบุรี': 'Bangkok_Metropolitan',
-    'ปทุมธานี': 'Bangkok_Metropolitan', 'นครปฐม': 'Bangkok_Metropolitan', 'สมุทรสาคร': 'Bangkok_Metropolitan',
-    'กาญจนบุรี': 'Central', 'ชัยนาท': 'Central', 'นครนายก': 'Central', 'พระนครศรีอยุธยา': 'Central', 'ลพบุรี': 'Central',
-    'สระบุรี': 'Central', 'สิงห์บุรี': 'Central', 'อ่างทอง': 'Central', 'ราชบุรี': 'Central', 'สุพรรณบุรี': 'Central',
-    'สมุทรสงคราม': 'Central', 'เชียงใหม่': 'North', 'เชียงราย': 'North', 'ลำปาง': 'North', 'ลำพูน': 'North',
-    'แม่ฮ่องสอน': 'North', 'น่าน': 'North', 'พะเยา': 'North', 'แพร่': 'North', 'อุตรดิตถ์': 'North', 'ตาก': 'North',
-    'สุโขทัย': 'North', 'พิษณุโลก': 'North', 'พิจิตร': 'North', 'กำแพงเพชร': 'North', 'เพชรบูรณ์': 'North',
-    'นครสวรรค์': 'North', 'อุทัยธานี': 'North', 'ขอนแก่น': 'Northeast', 'นครราชสีมา': 'Northeast', 'กาฬสินธุ์': 'Northeast',
-    'ชัยภูมิ': 'Northeast', 'นครพนม': 'Northeast', 'บึงกาฬ': 'Northeast', 'บุรีรัมย์': 'Northeast', 'มหาสารคาม': 'Northeast',
-    'มุกดาหาร': 'Northeast', 'ยโสธร': 'Northeast', 'ร้อยเอ็ด': 'Northeast', 'เลย': 'Northeast', 'ศรีสะเกษ': 'Northeast',
-    'สกลนคร': 'Northeast', 'สุรินทร์': 'Northeast', 'หนองคาย': 'Northeast', 'หนองบัวลำภู': 'Northeast', 'อำนาจเจริญ': 'Northeast',
-    'อุดรธานี': 'Northeast', 'อุบลราชธานี': 'Northeast', 'ชลบุรี': 'East', 'จันทบุรี': 'East', 'ฉะเชิงเทรา': 'East',
-    'ตราด': 'East', 'ปราจีนบุรี': 'East', 'ระยอง': 'East', 'สระแก้ว': 'East', 'กระบี่': 'South', 'ชุมพร': 'South',
-    'ตรัง': 'South', 'นครศรีธรรมราช': 'South', 'นราธิวาส': 'South', 'ปัตตานี': 'South', 'พังงา': 'South',
-    'พัทลุง': 'South', 'ภูเก็ต': 'South', 'ยะลา': 'South', 'ระนอง': 'South', 'สงขลา': 'South', 'สตูล': 'South',
-    'สุราษฎร์ธานี': 'South', 'ไม่ระบุ': 'Unspecified', 'อื่นๆ': 'Unspecified', 'Unknown': 'Unspecified',
-    None: 'Unspecified', '': 'Unspecified'
-}
 
-# --- 3. อ่านข้อมูลจากไฟล์ MS ---
-ms_file_path = f"{ms_data_folder}{ms_file_name}"
-try:
-    df_ms_raw = pd.read_csv(ms_file_path, encoding='utf-8')
-except FileNotFoundError:
-    print(f"Error: MS file not found at {ms_file_path}. Please check file path and name.")
-    exit()
-except Exception as e:
-    print(f"Error reading MS file: {e}")
-    exit()
-
-# --- 4. Clean & Rename คอลัมน์ ---
-df_ms_raw = df_ms_raw.rename(columns={
+# --- 1. Common Data Model Columns และ mapping ของ MS (กำหนดที่ mapping_registry.py) ---
+all_common_data_model_columns = mapping_registry.all_common_data_model_columns
+ms_mapping_tables = mapping_registry.ms_mapping_tables
+
+# --- 2. Dimension ของ MS: คอลัมน์ดิบ -> integer codes ---
+ms_column_rename = {
     'Resp ID': 'Respondent_ID', 'Q1_Age': 'Age', 'Q2_Gender': 'Gender',
     'Q3_Personal_Income': 'Personal_Income', 'Q4_Household_Income': 'Household_Income',
     'Q5_Occupation': 'Occupation', 'Q6_Employment': 'Employment_Status',
     'Q7_Province': 'Province', 'Q8_Car_Num': 'Number_of_Cars_at_Home',
     'Q9_Car_Owner': 'Owner_of_Car',
-})
-
-print("MS Raw Data Columns after Rename:", df_ms_raw.columns)
-
-# --- 5. สร้าง Dictionary เพื่อเก็บผลลัพธ์ ---
-ms_monthly_summary = {}
-ms_monthly_summary['Panel_Source'] = 'MS'
-ms_monthly_summary['Collected_Month'] = pd.to_datetime(current_month)
-ms_monthly_summary['Total_Respondents_Count'] = len(df_ms_raw)
-
-# --- 6. ประมวลผล Gender ---
-df_ms_raw['Gender_Cleaned'] = df_ms_raw['Gender'].astype(str).str.strip().str.lower().replace({'ชาย': 'male', 'หญิง': 'female'})
-ms_monthly_summary['Gender_Male_Count'] = (df_ms_raw['Gender_Cleaned'] == 'male').sum()
-ms_monthly_summary['Gender_Female_Count'] = (df_ms_raw['Gender_Cleaned'] == 'female').sum()
-
-# --- 7. ประมวลผล Age ---
-df_ms_raw['Age_DS_Standard'] = df_ms_raw['Age'].apply(map_ms_age_to_ds_standard)
-age_counts = df_ms_raw['Age_DS_Standard'].value_counts()
-age_categories_list = ['18_19', '20_29', '30_39', '40_49', '50_59', '60_69', '70_99']
-for age_cat in age_categories_list:
-    ms_monthly_summary[f'Age_{age_cat}_Count'] = age_counts.get(age_cat, 0)
-
-# --- 8. ประมวลผล SES ---
-df_ms_raw['SES_Personal_Category'] = df_ms_raw['Personal_Income'].apply(map_income_range_to_ses)
-df_ms_raw['SES_Household_Category'] = df_ms_raw['Household_Income'].apply(map_income_range_to_ses)
-ses_personal_counts = df_ms_raw['SES_Personal_Category'].value_counts()
-ses_household_counts = df_ms_raw['SES_Household_Category'].value_counts()
-ses_categories_list_with_unspecified = ['A', 'B_Plus', 'B', 'C_Plus', 'C', 'D', 'E', 'Unspecified']
-for ses_cat in ses_categories_list_with_unspecified:
-    key = ses_cat if ses_cat != 'B_Plus' else 'B+'
-    ms_monthly_summary[f'SES_Personal_{ses_cat}_Count'] = ses_personal_counts.get(key, 0)
-    ms_monthly_summary[f'SES_Household_{ses_cat}_Count'] = ses_household_counts.get(key, 0)
-
-# --- 9. ประมวลผล Occupation ---
-occupation_map = {
-    'ข้าราชการ/พนักงานรัฐวิสาหกิจ': 'Government',
-    'พนักงานบริษัท': 'Professional',
-    'พนักงานบริษัท/ลูกจ้างเอกชน': 'Professional',
-    'พนักงานประจำโรงงาน': 'General_Labor',
-    'นักเรียน/นักศึกษา': 'Student',
-    'แม่บ้าน/พ่อบ้าน': 'Housewife',
-    'เกษตรกร/ประมง': 'General_Labor',
-    'รับจ้างทั่วไป': 'General_Labor',
-    'ไม่ได้ทำงาน/เกษียณ': 'Unemployed',
-    'ว่างงาน': 'Unemployed',
-    'ผู้ประกอบอาชีพอิสระ': 'Others',
-    'กลุ่มอาชีพ รายได้ไม่ประจำ เช่น \nฟรีแลนซ์ , อาชีพอิสระ': 'Others',
-    'อื่นๆ': 'Others',
-    'ไม่ระบุ': 'Unspecified',
-}
-df_ms_raw['Occupation_Cleaned'] = df_ms_raw['Occupation'].astype(str).str.strip().map(occupation_map).fillna('Unspecified')
-occupation_counts = df_ms_raw['Occupation_Cleaned'].value_counts()
-occupation_categories = [
-    'Government', 'Professional', 'Commercial_Service', 'Student', 'General_Labor',
-    'Unemployed', 'Housewife', 'Others', 'Unspecified'
-]
-for occ_cat in occupation_categories:
-    ms_monthly_summary[f'Occupation_{occ_cat}_Count'] = occupation_counts.get(occ_cat, 0)
-
-# --- 10. ประมวลผล Employment Status ---
-employment_map = {
-    'ทำงานเต็มเวลา (30 ชั่วโมงขึ้นไป/สัปดาห์)': 'Employed_Someone_Else_More_30_Hrs',
-    'ทำงานนอกเวลา (น้อยกว่า 30 ชั่วโมง/สัปดาห์)': 'Employed_Someone_Else_Less_30_Hrs',
-    'เจ้าของกิจการ/ทำงานอิสระ': 'Self_Employed',
-    'นักเรียน/นักศึกษา': 'Student',
-    'แม่บ้าน/พ่อบ้าน': 'Housewife',
-    'ว่างงาน/กำลังหางาน': 'Not_Employed_Looking',
-    'เกษียณ': 'Not_Employed_Other'
 }
-# FIX: แปลงคอลัมน์เป็น string ก่อนใช้ .str เพื่อป้องกัน error กรณีคอลัมน์ว่าง
-df_ms_raw['Employment_Cleaned'] = df_ms_raw['Employment_Status'].astype(str).str.strip().map(employment_map).fillna('Unspecified')
-employment_counts = df_ms_raw['Employment_Cleaned'].value_counts()
-employment_categories = [
-    'Employed_Someone_Else_More_30_Hrs', 'Employed_Someone_Else_Less_30_Hrs', 'Self_Employed',
-    'Not_Employed_Looking', 'Student', 'Housewife', 'Not_Employed_Other', 'Unspecified'
-]
-for emp_cat in employment_categories:
-    ms_monthly_summary[f'Employment_{emp_cat}_Count'] = employment_counts.get(emp_cat, 0)
-
-# --- 11. ประมวลผล Region ---
-df_ms_raw['Region_Mapped'] = df_ms_raw['Province'].astype(str).str.strip().apply(lambda x: province_to_region_map.get(x, 'Unspecified'))
-region_counts = df_ms_raw['Region_Mapped'].value_counts()
-region_categories_list = ['Bangkok_Metropolitan', 'Central', 'Northeast', 'North', 'East', 'West', 'South', 'Unspecified']
-for region_cat in region_categories_list:
-    ms_monthly_summary[f'Region_{region_cat}_Count'] = region_counts.get(region_cat, 0)
-
-# --- 12. ประมวลผล Number of Cars at Home ---
-cars_at_home_map = {
-    '0': '0', '1': '1', '2': '2', '3': '3_Or_More', '4': '3_Or_More',
-    '3 or more': '3_Or_More', 'ไม่มี': '0',
-    'ไม่ระบุ': 'Unspecified'
+
+# dimension -> คอลัมน์หลัง rename
+ms_dimension_columns = {
+    'Gender': 'Gender', 'Age': 'Age', 'SES_Personal': 'Personal_Income', 'SES_Household': 'Household_Income',
+    'Occupation': 'Occupation', 'Employment': 'Employment_Status', 'Region': 'Province',
+    'Cars': 'Number_of_Cars_at_Home', 'Car_Owner': 'Owner_of_Car',
 }
-df_ms_raw['Cars_Cleaned'] = df_ms_raw['Number_of_Cars_at_Home'].astype(str).str.strip().map(cars_at_home_map).fillna('Unspecified')
-cars_counts = df_ms_raw['Cars_Cleaned'].value_counts()
-cars_categories = ['0', '1', '2', '3_Or_More', 'Unspecified']
-for car_cat in cars_categories:
-    ms_monthly_summary[f'Cars_At_Home_{car_cat}_Count'] = cars_counts.get(car_cat, 0)
-
-# --- 13. ประมวลผล Car Owner ---
-car_owner_map = {
-    'ตนเอง': 'Yourself', 'คู่สมรส': 'Spouse', 'บิดา/มารดา': 'Parent', 'บุตร': 'Child',
-    'ปู่ย่า/ตายาย': 'Grandparents', 'พี่น้อง': 'Brothers_Sisters',
-    'อื่นๆ': 'Others', 'ไม่ทราบ': 'Dont_Know', 'ไม่มี': 'Dont_Know',
-    'ไม่ระบุ': 'Dont_Know'
+
+# ชื่อ dimension: (คอลัมน์หลัง rename, ฟังก์ชันแปลงคอลัมน์เป็น codes, categories)
+# ฟังก์ชันแปลงรับ (คอลัมน์, memo, unmapped) โดย memo คือ dict ค่าดิบ -> category ที่เคย map แล้ว (เก็บข้ามเดือนใน panel_cache)
+# และ unmapped คือ dict ค่าดิบ -> จำนวนแถวที่ตกไปที่ default (ใช้ทำ data-quality report)
+ms_dimensions = {
+    dim: (ms_dimension_columns[dim], dim_map.encode, dim_map.categories)
+    for dim, dim_map in mapping_registry.ms_dimension_maps.items()
 }
-df_ms_raw['Car_Owner_Cleaned'] = df_ms_raw['Owner_of_Car'].astype(str).str.strip().map(car_owner_map).fillna('Dont_Know')
-car_owner_counts = df_ms_raw['Car_Owner_Cleaned'].value_counts()
-car_owner_categories = [
-    'Yourself', 'Spouse', 'Parent', 'Child', 'Grandparents',
-    'Brothers_Sisters', 'Others', 'Dont_Know'
-]
-for owner_cat in car_owner_categories:
-    ms_monthly_summary[f'Car_Owner_{owner_cat}_Count'] = car_owner_counts.get(owner_cat, 0)
-
-# --- 14. สร้าง DataFrame สุดท้ายสำหรับ MS ---
-df_ms_result = pd.DataFrame([ms_monthly_summary])
-df_ms_result = df_ms_result.reindex(columns=all_common_data_model_columns).fillna(0)
-
-# แปลงคอลัมน์ Count ทั้งหมดให้เป็น integer
-for col in df_ms_result.columns:
-    if '_Count' in col:
-        df_ms_result[col] = df_ms_result[col].astype(int)
-
-print("\nMS Monthly Summary (Preview):")
-print(df_ms_result.transpose())
-
-if not os.path.exists(processed_data_folder):
-   os.makedirs(processed_data_folder)
-output_file_path = f"{processed_data_folder}temp_ms_data_{current_month.replace('-', '')[:6]}.csv"
-df_ms_result.to_csv(output_file_path, index=False, encoding='utf-8')
-print(f"\nProcessed MS data saved to {output_file_path}")
\ No newline at end of file
+
+ms_dimension_categories = {dim: categories for dim, (_, _, categories) in ms_dimensions.items()}
+
+def encode_ms_chunk(df, value_memo=None, unmapped=None):
+    return {
+        dim: encode(df[column], None if value_memo is None else value_memo.setdefault(dim, {}),
+                    None if unmapped is None else unmapped.setdefault(dim, {}))
+        for dim, (column, encode, categories) in ms_dimensions.items()
+    }
+
+# --- 3. ประมวลผล MS ของเดือนที่กำหนด (คืน DataFrame 1 แถวตาม common model) ---
+def ms_input_path(ms_data_folder, month_code):
+    # ms_data_YYYYMM.parquet / .feather / .csv (ดู panel_io.input_extensions)
+    return find_input(f"{ms_data_folder}ms_data_{month_code}")
+
+def process_ms_month(current_month, ms_data_folder=ms_data_folder, chunk_size=ms_chunk_size, use_cache=True, workers=ms_workers):
+    return MSAdapter(ms_data_folder).process_month(current_month, use_cache, chunk_size=chunk_size, workers=workers)
+
+def encode_ms_frame(df_ms_chunk, save_cube, value_memo=None):
+    # 1 chunk/shard -> (จำนวนแถว, counts ต่อ dimension, codes ต่อ dimension, Respondent_ID, ค่าดิบที่ map ไม่ได้ต่อ dimension)
+    df_ms_chunk = df_ms_chunk.rename(columns=ms_column_rename)
+    unmapped = {}
+    codes = encode_ms_chunk(df_ms_chunk, value_memo, unmapped)
+    counts = {dim: count_codes(dim_codes, ms_dimensions[dim][2]) for dim, dim_codes in codes.items()}
+    ids = None
+    if save_cube and 'Respondent_ID' in df_ms_chunk.columns:
+        ids = respondent_cube.encode_respondent_ids(df_ms_chunk['Respondent_ID'])
+    return len(df_ms_chunk), counts, codes if save_cube else None, ids, unmapped
+
+def encode_ms_shard(ms_file_path, header, byte_range, ms_usecols, save_cube, value_memo):
+    # รันใน worker process: parse เฉพาะช่วง byte ของตัวเอง แล้วส่ง memo ที่เพิ่มขึ้นกลับมาด้วย
+    df_ms_chunk = read_record_range(ms_file_path, header, *byte_range, ms_usecols)
+    return encode_ms_frame(df_ms_chunk, save_cube, value_memo), value_memo
+
+def compute_ms_month(current_month, ms_data_folder=ms_data_folder, chunk_size=ms_chunk_size, save_cube=True, workers=ms_workers):
+    # อ่านเฉพาะคอลัมน์ที่ใช้ และ streaming ทีละ chunk ถ้าตั้ง chunk_size
+    # workers > 1 (เฉพาะ CSV) -> แบ่งไฟล์เป็นช่วง byte ตามขอบ record แล้ว map ไปหลาย process (ผลลัพธ์เท่ากับแบบ process เดียว)
+    # save_cube=True -> เก็บ codes ระดับ respondent (.npy ต่อคอลัมน์) และ bitmap index ของเดือนนี้ด้วย
+    # อ่านทุกคอลัมน์เป็นข้อความ (Categorical) เพื่อให้ค่าที่ map ไม่ขึ้นกับว่า pandas เดา dtype จากแถวช่วงไหน หรือไฟล์เป็น format ใด
+    month_code = current_month.replace('-', '')[:6]
+    ms_file_path = ms_input_path(ms_data_folder, month_code)
+    ms_usecols = [raw for raw, renamed in ms_column_rename.items() if renamed != 'Respondent_ID']
+    # Respondent_ID ใช้เฉพาะตอนบันทึก cube (ถ้าไฟล์เดือนนั้นมีคอลัมน์ Resp ID)
+    read_ids = save_cube and 'Resp ID' in input_columns(ms_file_path)
+    if read_ids:
+        ms_usecols = ms_usecols + ['Resp ID']
+    ms_category_totals = {dim: np.zeros(len(categories), dtype=np.int64) for dim, (_, _, categories) in ms_dimensions.items()}
+    ms_total_rows = 0
+    ms_unmapped = {dim: {} for dim in ms_dimensions}
+    value_memo = panel_cache.load_value_memo('MS', ms_mapping_tables)
+    known_values = sum(len(values) for values in value_memo.values())
+    # codes/IDs ของแต่ละ chunk เขียนต่อท้ายลง cube ทันที (ไม่สะสมไว้ในหน่วยความจำ)
+    cube_writer = respondent_cube.CubeWriter(respondent_cube.cube_path(month_code), ms_dimension_categories, read_ids) if save_cube else None
+
+    def add_chunk(n_rows, counts, codes, ids, unmapped):
+        # รวม value counts ของแต่ละ chunk/shard เข้า running totals (ตามลำดับในไฟล์)
+        nonlocal ms_total_rows
+        for dim in ms_dimensions:
+            ms_category_totals[dim] += counts[dim]
+            for value, count in unmapped[dim].items():
+                ms_unmapped[dim][value] = ms_unmapped[dim].get(value, 0) + count
+        if cube_writer:
+            cube_writer.append(codes, ids)
+        ms_total_rows += n_rows
+
+    if workers and workers > 1 and file_format(ms_file_path) == 'csv':
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            header, byte_ranges = split_records(ms_file_path, workers, map=executor.map)
+            ms_shard_results = executor.map(
+                encode_ms_shard, repeat(ms_file_path), repeat(header), byte_ranges, repeat(ms_usecols), repeat(save_cube),
+                repeat(value_memo))
+            for encoded, shard_memo in ms_shard_results:
+                add_chunk(*encoded)
+                for dim, values in shard_memo.items():
+                    value_memo.setdefault(dim, {}).update(values)
+    else:
+        if chunk_size:
+            ms_chunks = iter_text_chunks(ms_file_path, ms_usecols, chunk_size)
+        else:
+            ms_chunks = [read_text_columns(ms_file_path, ms_usecols)]
+        for df_ms_chunk in ms_chunks:
+            add_chunk(*encode_ms_frame(df_ms_chunk, save_cube, value_memo))
+    if sum(len(values) for values in value_memo.values()) > known_values:
+        panel_cache.save_value_memo('MS', ms_mapping_tables, value_memo)
+
+    if cube_writer:
+        cube_writer.finish()
+        # bitmap index สร้างจาก cube ที่เพิ่งเขียน (mmap) ทีละ dimension
+        os.makedirs(bitmap_index.bitmap_folder, exist_ok=True)  # backfill เขียนหลายเดือนพร้อมกันได้
+        cube = respondent_cube.RespondentCube.load(respondent_cube.cube_path(month_code))
+        bitmap_index.save_bitmap_index(bitmap_index.bitmap_path(month_code), cube.codes, ms_dimension_categories)
+
+    ms_counts = {dim: pd.Series(ms_category_totals[dim], index=categories) for dim, (_, _, categories) in ms_dimensions.items()}
+    print(f"MS rows processed ({month_code}): {ms_total_rows:,}")
+    df_ms_result = build_ms_summary(current_month, ms_counts, ms_total_rows)
+    data_quality.write_quality_report('MS', current_month, df_ms_result, ms_unmapped)
+    return df_ms_result
+
+def build_ms_summary(current_month, ms_counts, ms_total_rows):
+    # ms_counts: dimension -> Series ของจำนวนต่อ category (index ตาม categories ของ ms_dimensions)
+    # --- 5. ทุก dimension -> 1 แถวตาม common model (category นอก common model เช่น Gender 'Other' ไม่มีคอลัมน์) ---
+    return mapping_registry.common_model_row('MS', current_month, ms_total_rows, ms_counts, mapping_registry.ms_dimension_maps)
+
+# --- 6. MS adapter (ดู panel_adapters.py) ---
+# ไฟล์ MS ใหญ่ จึงไม่ใช่ TableAdapter (load ทั้งไฟล์แล้ว normalize): compute_month อ่านและ map เป็น codes ทีละ chunk/shard
+class MSAdapter(panel_adapters.PanelAdapter):
+    panel = 'MS'
+    display_name = 'Meow'
+    icon = '🐱'
+    color = '#FF6B35'
+    dimension_maps = mapping_registry.ms_dimension_maps
+    mapping_tables = ms_mapping_tables + [ms_column_rename, encode_ms_chunk, encode_ms_frame, encode_ms_shard, build_ms_summary]
+
+    def __init__(self, ms_data_folder=ms_data_folder):
+        self.ms_data_folder = ms_data_folder
+
+    def input_paths(self, current_month):
+        return [ms_input_path(self.ms_data_folder, current_month.replace('-', '')[:6])]
+
+    def compute_month(self, current_month, chunk_size=ms_chunk_size, workers=ms_workers):
+        return compute_ms_month(current_month, self.ms_data_folder, chunk_size, workers=workers)
+
+    def process_month(self, current_month, use_cache=True, chunk_size=ms_chunk_size, workers=ms_workers, incremental=False):
+        # incremental=True -> ประมวลผลเฉพาะ respondent ใหม่/เปลี่ยนแปลงจาก cumulative extract (ดู ms_incremental.py)
+        if incremental:
+            from ms_incremental import ingest_ms_month
+            return ingest_ms_month(current_month, self.ms_data_folder)
+        # cache hit จะไม่สร้าง respondent cube ใหม่ จึงต้องประมวลผลใหม่ถ้า cube ของเดือนนี้ยังไม่มี (หรือ encode ID ด้วยวิธีเก่า)
+        if not respondent_cube.cube_is_current(respondent_cube.cube_path(current_month.replace('-', '')[:6])):
+            use_cache = False
+        return super().process_month(current_month, use_cache, chunk_size=chunk_size, workers=workers)
+
+panel_adapters.register_adapter(MSAdapter())
+
+if __name__ == '__main__':
+    try:
+        df_ms_result = process_ms_month(current_month)
+    except FileNotFoundError as e:
+        print(f"Error: MS file not found. {e}")
+        exit()
+    except Exception as e:
+        print(f"Error reading MS file: {e}")
+        exit()
+
+    print("\nMS Monthly Summary (Preview):")
+    print(df_ms_result.transpose())
+
+    if not os.path.exists(processed_data_folder):
+       os.makedirs(processed_data_folder)
+    output_file_path = f"{processed_data_folder}temp_ms_data_{current_month.replace('-', '')[:6]}.csv"
+    df_ms_result.to_csv(output_file_path, index=False, encoding='utf-8')
+    print(f"\nProcessed MS data saved to {output_file_path}")
@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# --- Respondent cube ของ MS: 1 คอลัมน์ small-int code ต่อ dimension (1 แถว = 1 respondent) ---
+# ใช้ตอบ cross-tab เช่น "Silver Gen AND Auto AND UPC" ได้ ซึ่ง marginal counts ใน summary ตอบไม่ได้
+# process_ms_data.py บันทึก cube ทุกเดือนเป็น columnar binary แบบ fixed-width:
+#   processed_data/ms_codes/YYYYMM/<dimension>.npy (int8), Respondent_ID.npy (int64), categories.json, cube.json
+# ผู้อ่านเปิดด้วย np.load(mmap_mode='r') -> ไม่ต้อง parse CSV และไม่ copy ข้อมูล (ใช้แค่ page cache)
+
+cube_folder = './processed_data/ms_codes/'
+
+# วิธี encode Respondent_ID (บันทึกใน cube.json): cube ที่ encode ต่างวิธี join ข้ามเดือน/ต่อท้ายกันไม่ได้ ต้องสร้างใหม่
+respondent_id_encoding = 'text-hash64'
+
+# audience หลักของ dashboard ในรูป filter ของ cube (นิยามเดียวกับ Silver_Gen/Auto/UPC ใน dashboard.py)
+audience_filters = {
+    'Silver_Gen': {'Age': ['60_69', '70_99']},
+    'Auto': {'Cars': ['1', '2', '3_Or_More']},
+    'UPC': {'Region': ['Central', 'Northeast', 'North', 'East', 'West', 'South']},
+}
+
+
+def cube_path(month_code, folder=cube_folder):
+    return os.path.join(folder, month_code)
+
+
+def encode_respondent_ids(values):
+    # Respondent_ID -> int64 ด้วย hash 64-bit ของข้อความเสมอ: ID เดียวกันได้ค่าเดียวกันทุก chunk/shard/เดือน/ส่วนที่ต่อท้าย
+    # ไม่ว่า ID อื่นในชุดเดียวกันจะเป็นตัวเลขหรือไม่ (ค่าดิบเป็นข้อความเสมอ ดู panel_io.read_text_columns)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # hash เฉพาะค่า unique แล้ว take ตาม codes (code -1 = NA -> hash ของ 'nan')
+        texts = np.append(values.cat.categories.astype(str).to_numpy(dtype=object), 'nan')
+        return pd.util.hash_array(texts)[values.cat.codes.to_numpy()].view(np.int64)
+    texts = values.astype(object).where(values.notna(), 'nan').astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(texts).view(np.int64)
+
+
+def cube_is_current(path):
+    # มี cube แล้ว และ Respondent_ID (ถ้ามี) encode ด้วยวิธีปัจจุบัน
+    if not os.path.exists(os.path.join(path, 'categories.json')):
+        return False
+    if not os.path.exists(os.path.join(path, 'Respondent_ID.npy')):
+        return True
+    try:
+        with open(os.path.join(path, 'cube.json'), encoding='utf-8') as f:
+            return json.load(f).get('id_encoding') == respondent_id_encoding
+    except FileNotFoundError:
+        return False
+
+
+def save_cube(path, codes, categories, respondent_ids=None, extra_arrays=None, state=None):
+    # เขียนลงโฟลเดอร์ชั่วคราวก่อน แล้วค่อยสลับเข้าที่ เพื่อไม่ให้ผู้อ่านเห็น cube ที่เขียนไม่ครบ
+    # extra_arrays / state: ข้อมูลเสริมที่เก็บคู่กับ cube (เช่น sorted ID index และ state ของ incremental ingest)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for dim, dim_codes in codes.items():
+        np.save(os.path.join(tmp_path, f'{dim}.npy'), np.ascontiguousarray(dim_codes, dtype=np.int8))
+    if respondent_ids is not None:
+        respondent_ids = np.ascontiguousarray(respondent_ids, dtype=np.int64)
+        np.save(os.path.join(tmp_path, 'Respondent_ID.npy'), respondent_ids)
+        extra_arrays = dict(extra_arrays or {})
+        if 'ID_Order' not in extra_arrays:
+            extra_arrays.update(id_index(respondent_ids))
+    _finish_cube(tmp_path, path, categories, respondent_ids is not None, extra_arrays, state)
+
+
+def id_index(respondent_ids):
+    # sorted ID index (สร้างครั้งเดียวตอนเขียน) ให้ join ข้ามเดือนได้โดยไม่ต้อง sort ใหม่
+    id_order = np.argsort(respondent_ids, kind='stable')
+    return {'ID_Order': id_order, 'ID_Sorted': np.asarray(respondent_ids[id_order])}
+
+
+def _finish_cube(tmp_path, path, categories, with_ids, extra_arrays=None, state=None):
+    # เขียน metadata ลงโฟลเดอร์ชั่วคราว แล้วสลับเข้าที่
+    if with_ids:
+        with open(os.path.join(tmp_path, 'cube.json'), 'w', encoding='utf-8') as f:
+            json.dump({'id_encoding': respondent_id_encoding}, f)
+    for name, array in (extra_arrays or {}).items():
+        np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(tmp_path, 'categories.json'), 'w', encoding='utf-8') as f:
+        json.dump(categories, f, ensure_ascii=False, indent=2)
+    if state is not None:
+        with open(os.path.join(tmp_path, 'state.json'), 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+class CubeWriter:
+    # เขียน cube ทีละ chunk (ผลเหมือน save_cube): ต่อท้าย bytes ของแต่ละคอลัมน์ลงไฟล์ .part ในโฟลเดอร์ชั่วคราว
+    # ไม่เก็บ codes/IDs ของทุก chunk ไว้ในหน่วยความจำ -> หน่วยความจำไม่ขึ้นกับขนาดไฟล์
+    # finish() แปลง .part เป็น .npy (header + copy แบบ streaming) แล้วสร้าง sorted ID index จาก Respondent_ID แบบ mmap
+    def __init__(self, path, categories, with_ids=False):
+        self.path = path
+        self.categories = categories
+        self.tmp_path = f"{path}.tmp"
+        self.n_rows = 0
+        self.dtypes = {dim: np.dtype(np.int8) for dim in categories}
+        if with_ids:
+            self.dtypes['Respondent_ID'] = np.dtype(np.int64)
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self._files = {name: open(self._part_path(name), 'wb') for name in self.dtypes}
+
+    def _part_path(self, name):
+        return os.path.join(self.tmp_path, f'{name}.part')
+
+    def append(self, codes, respondent_ids=None):
+        arrays = dict(codes)
+        if 'Respondent_ID' in self.dtypes:
+            arrays['Respondent_ID'] = respondent_ids
+        for name, dtype in self.dtypes.items():
+            self._files[name].write(np.ascontiguousarray(arrays[name], dtype=dtype).data)
+        self.n_rows += len(next(iter(arrays.values())))
+
+    def finish(self, state=None):
+        for name, dtype in self.dtypes.items():
+            self._files[name].close()
+            with open(os.path.join(self.tmp_path, f'{name}.npy'), 'wb') as out, open(self._part_path(name), 'rb') as part:
+                header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (self.n_rows,)}
+                np.lib.format.write_array_header_1_0(out, header)
+                shutil.copyfileobj(part, out, 16 * 1024 * 1024)
+            os.remove(self._part_path(name))
+        extra_arrays = None
+        if 'Respondent_ID' in self.dtypes:
+            # ปิด mmap ก่อนย้ายโฟลเดอร์ (Windows ย้ายโฟลเดอร์ที่มีไฟล์เปิดอยู่ไม่ได้)
+            respondent_ids = np.load(os.path.join(self.tmp_path, 'Respondent_ID.npy'), mmap_mode='r')
+            extra_arrays = id_index(respondent_ids)
+            del respondent_ids
+        _finish_cube(self.tmp_path, self.path, self.categories, 'Respondent_ID' in self.dtypes, extra_arrays, state)
+
+
+class RespondentCube:
+    def __init__(self, codes, categories, respondent_ids=None):
+        self.codes = codes
+        self.categories = categories
+        self.respondent_ids = respondent_ids
+        self.id_sorted, self.id_order = None, None  # sorted ID index (ถ้ามี)
+        self._positions = {dim: {cat: i for i, cat in enumerate(cats)} for dim, cats in categories.items()}
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mmap_mode = 'r' if mmap else None
+        with open(os.path.join(path, 'categories.json'), encoding='utf-8') as f:
+            categories = json.load(f)
+        codes = {dim: np.load(os.path.join(path, f'{dim}.npy'), mmap_mode=mmap_mode) for dim in categories}
+        ids_path = os.path.join(path, 'Respondent_ID.npy')
+        respondent_ids = np.load(ids_path, mmap_mode=mmap_mode) if os.path.exists(ids_path) else None
+        cube = cls(codes, categories, respondent_ids)
+        if respondent_ids is not None and os.path.exists(os.path.join(path, 'ID_Order.npy')):
+            cube.id_sorted = np.load(os.path.join(path, 'ID_Sorted.npy'), mmap_mode=mmap_mode)
+            cube.id_order = np.load(os.path.join(path, 'ID_Order.npy'), mmap_mode=mmap_mode)
+        return cube
+
+    @classmethod
+    def concat(cls, cubes):
+        # รวมหลายเดือนเป็น cube เดียว (categories ต้องเหมือนกัน) -- ตรงนี้ copy ข้อมูลเข้าหน่วยความจำ
+        categories = cubes[0].categories
+        codes = {dim: np.concatenate([cube.codes[dim] for cube in cubes]) for dim in categories}
+        return cls(codes, categories)
+
+    def __len__(self):
+        return len(next(iter(self.codes.values()), []))
+
+    def mask(self, **filters):
+        # filters: dimension=category หรือ dimension=[category, ...]; หลาย dimension คือ AND กัน
+        mask = np.ones(len(self), dtype=bool)
+        for dim, wanted in filters.items():
+            wanted = [wanted] if isinstance(wanted, str) else wanted
+            allowed = np.zeros(len(self.categories[dim]), dtype=bool)
+            allowed[[self._positions[dim][cat] for cat in wanted]] = True
+            mask &= allowed[self.codes[dim]]
+        return mask
+
+    def count(self, **filters):
+        return int(np.count_nonzero(self.mask(**filters)))
+
+    def audience_count(self, *audiences, **filters):
+        # เช่น cube.audience_count('Silver_Gen', 'Auto', 'UPC')
+        combined = dict(filters)
+        for audience in audiences:
+            combined.update(audience_filters[audience])
+        return self.count(**combined)
+
+    def crosstab(self, by, **filters):
+        # นับจำนวน respondents ทุก combination ของ dimensions ใน by ด้วย bincount ครั้งเดียว
+        by = [by] if isinstance(by, str) else list(by)
+        selected = self.mask(**filters) if filters else slice(None)
+        shape = tuple(len(self.categories[dim]) for dim in by)
+        flat = np.ravel_multi_index(tuple(self.codes[dim][selected].astype(np.intp) for dim in by), shape)
+        counts = np.bincount(flat, minlength=int(np.prod(shape)))
+        if len(by) == 1:
+            return pd.Series(counts, index=pd.Index(self.categories[by[0]], name=by[0]), name='Respondents')
+        # แถว = combination ของ dimensions แรก ๆ, คอลัมน์ = dimension สุดท้าย
+        rows = pd.MultiIndex.from_product([self.categories[dim] for dim in by[:-1]], names=by[:-1])
+        columns = pd.Index(self.categories[by[-1]], name=by[-1])
+        return pd.DataFrame(counts.reshape(-1, shape[-1]), index=rows, columns=columns)
+
+
+def load_state(path):
+    try:
+        with open(os.path.join(path, 'state.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_months(month_codes, folder=cube_folder):
+    # เปิดหลายเดือนแบบ memory-mapped (zero-copy): คืน dict month_code -> RespondentCube
+    return {month_code: RespondentCube.load(cube_path(month_code, folder)) for month_code in month_codes}
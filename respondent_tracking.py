@@ -0,0 +1,216 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import respondent_cube
+import mapping_registry
+
+# --- Longitudinal tracking ของ MS respondents ข้ามเดือน (join ด้วย Respondent_ID แบบ int64) ---
+# อ่าน Respondent_ID ของทุกเดือนจาก respondent cube (processed_data/ms_codes/YYYYMM/) แบบ memory-mapped
+# แล้ว sort (ID, เดือน) ครั้งเดียว -> ได้ history ของทุก respondent โดยไม่ต้อง join ทีละคู่เดือน
+# ID ของแต่ละเดือนเรียงมาแล้ว การ sort แบบ stable จึงเป็นแค่การ merge sorted runs (เร็วแม้ 24 เดือน x หลายล้าน ID)
+#
+# นิยาม (เทียบกับเดือนก่อนหน้าที่มี cube -> แต่ละเดือนขึ้นกับแค่ 2 cube ไม่ขึ้นกับจำนวนเดือนใน history):
+#   Returning = อยู่ทั้งเดือนก่อนหน้าและเดือนนี้, New = อยู่ในเดือนนี้แต่ไม่อยู่ในเดือนก่อนหน้า (รวมคนที่หายไปแล้วกลับมา)
+#   Churned = อยู่ในเดือนก่อนหน้าแต่ไม่อยู่ในเดือนนี้; เดือนแรกที่มี cube: ทุกคนเป็น New
+#   ผู้ที่เจอครั้งแรก (cohort) ดูได้จาก retention_matrix()
+# คอลัมน์ใน summary (add_tracking_columns): ประมวลผลเดือน M แล้วต้องคำนวณเดือนถัดไปที่มี cube ใหม่ด้วย (following_months)
+#   panel ที่ไม่มี Respondent_ID (เช่น DS) หรือเดือนที่ไม่มี cube ได้ค่าว่าง (NULL) ไม่ใช่ 0
+#
+# ตัวอย่าง:
+#   history = RespondentHistory.load()
+#   history.monthly_counts(); history.retention_matrix(); history.attribute_drift('SES_Household')
+
+tracking_columns = mapping_registry.tracking_columns
+tracking_panel = 'MS'
+
+
+def available_months(folder=respondent_cube.cube_folder):
+    # เดือนที่มี cube พร้อม Respondent_ID (ไฟล์ MS ที่ไม่มีคอลัมน์ Resp ID จะไม่ถูกนับ)
+    # cube ที่ encode ID ด้วยวิธีเก่าจะถูกข้าม (join กับเดือนอื่นไม่ได้) จนกว่าจะประมวลผลเดือนนั้นใหม่
+    if not os.path.exists(folder):
+        return []
+    return sorted(
+        name for name in os.listdir(folder)
+        if re.fullmatch(r'\d{6}', name) and os.path.exists(os.path.join(folder, name, 'Respondent_ID.npy'))
+        and respondent_cube.cube_is_current(os.path.join(folder, name))
+    )
+
+
+def unique_respondents(cube):
+    # ID ที่ไม่ซ้ำ (เรียงแล้ว) + แถวใน cube ของแต่ละ ID (ID ซ้ำในเดือนเดียวกัน -> ใช้แถวล่าสุด)
+    # ใช้ sorted ID index ที่เก็บไว้กับ cube ถ้ามี (ไม่ต้อง sort ใหม่)
+    if cube.id_order is not None:
+        id_sorted, id_order = np.asarray(cube.id_sorted), np.asarray(cube.id_order)
+    else:
+        id_order = np.argsort(cube.respondent_ids, kind='stable')
+        id_sorted = np.asarray(cube.respondent_ids)[id_order]
+    last = np.ones(len(id_sorted), dtype=bool)
+    last[:-1] = id_sorted[1:] != id_sorted[:-1]
+    return id_sorted[last], id_order[last]
+
+
+class RespondentHistory:
+    def __init__(self, month_codes, cubes):
+        self.month_codes = list(month_codes)
+        self.cubes = cubes
+        self.month_ids, self.month_rows = [], []
+        for month_code in self.month_codes:
+            unique_ids, rows = unique_respondents(cubes[month_code])
+            self.month_ids.append(unique_ids)
+            self.month_rows.append(rows)
+
+        n_months = len(self.month_codes)
+        all_ids = np.concatenate(self.month_ids) if n_months else np.empty(0, dtype=np.int64)
+        all_months = np.repeat(np.arange(n_months, dtype=np.int16), [len(ids) for ids in self.month_ids])
+        # stable -> ภายใน ID เดียวกันเรียงตามเดือน (แต่ละเดือนเรียงมาแล้ว จึงเป็นการ merge sorted runs)
+        self.order = np.argsort(all_ids, kind='stable')
+        ids = all_ids[self.order]
+        self.months = all_months[self.order]
+
+        # 1 แถว = (respondent, เดือนที่เจอ); first = แถวแรกของ respondent นั้น
+        first = np.ones(len(ids), dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+        group_starts = np.flatnonzero(first)
+        self.first = first
+        self.cohorts = np.repeat(self.months[group_starts], np.diff(group_starts, append=len(ids)))
+        # เดือนถัดไปที่ respondent คนเดิมกลับมา (-1 = ไม่กลับมาอีก)
+        self.next_months = np.full(len(ids), -1, dtype=np.int16)
+        self.next_months[:-1] = np.where(first[1:], -1, self.months[1:])
+
+    @classmethod
+    def load(cls, month_codes=None, folder=respondent_cube.cube_folder):
+        month_codes = available_months(folder) if month_codes is None else sorted(month_codes)
+        return cls(month_codes, respondent_cube.load_months(month_codes, folder))
+
+    def monthly_counts(self):
+        n_months = len(self.month_codes)
+        present = np.array([len(ids) for ids in self.month_ids], dtype=np.int64)
+        # respondent ของเดือน t-1 ที่เดือนถัดไปที่เจอคือ t -> returning ในเดือน t, ไม่ใช่ t -> churned ในเดือน t
+        stays = self.next_months == self.months + 1
+        returning = np.bincount(self.months[stays].astype(np.intp) + 1, minlength=n_months + 1)[:n_months]
+        churned = np.bincount(self.months[~stays].astype(np.intp) + 1, minlength=n_months + 1)[:n_months]
+        return pd.DataFrame({
+            'Respondents': present,
+            'New_Respondents_Count': present - returning,
+            'Returning_Respondents_Count': returning,
+            'Churned_Respondents_Count': churned,
+        }, index=pd.Index(self.month_codes, name='Month'))
+
+    def retention_matrix(self, rate=False):
+        # แถว = cohort (เดือนที่เจอครั้งแรก), คอลัมน์ = เดือน, ค่า = จำนวน respondent ของ cohort ที่ยังอยู่ในเดือนนั้น
+        n_months = len(self.month_codes)
+        counts = np.bincount(self.cohorts.astype(np.intp) * n_months + self.months, minlength=n_months * n_months)
+        matrix = pd.DataFrame(
+            counts.reshape(n_months, n_months),
+            index=pd.Index(self.month_codes, name='Cohort'), columns=pd.Index(self.month_codes, name='Month'),
+        )
+        if rate:
+            cohort_sizes = np.diag(matrix.to_numpy()).astype(float)
+            matrix = matrix.div(np.where(cohort_sizes > 0, cohort_sizes, np.nan), axis=0)
+        return matrix
+
+    def transitions(self, dim, from_month, to_month):
+        # respondent ที่อยู่ทั้งสองเดือน: แถว = category เดือนก่อน, คอลัมน์ = category เดือนหลัง
+        i, j = self.month_codes.index(from_month), self.month_codes.index(to_month)
+        _, from_idx, to_idx = np.intersect1d(self.month_ids[i], self.month_ids[j], assume_unique=True, return_indices=True)
+        categories = self.cubes[from_month].categories[dim]
+        from_codes = np.asarray(self.cubes[from_month].codes[dim])[self.month_rows[i][from_idx]].astype(np.intp)
+        to_codes = np.asarray(self.cubes[to_month].codes[dim])[self.month_rows[j][to_idx]].astype(np.intp)
+        counts = np.bincount(from_codes * len(categories) + to_codes, minlength=len(categories) ** 2)
+        return pd.DataFrame(
+            counts.reshape(len(categories), len(categories)),
+            index=pd.Index(categories, name=f'{dim} ({from_month})'),
+            columns=pd.Index(categories, name=f'{dim} ({to_month})'),
+        )
+
+    def _row_codes(self, dim):
+        # code ของ dimension สำหรับทุกแถว (respondent, เดือน) ตามลำดับเดียวกับ self.months
+        per_month = [np.asarray(self.cubes[m].codes[dim])[rows] for m, rows in zip(self.month_codes, self.month_rows)]
+        return np.concatenate(per_month)[self.order].astype(np.intp)
+
+    def attribute_drift(self, dim, unranked=('Unspecified', 'Dont_Know')):
+        # สรุปการเปลี่ยน category ระหว่างเดือนติดกัน สำหรับ dimension ที่เรียงจากสูงไปต่ำ (เช่น SES: A, B_Plus, B, ...)
+        # Moved_Up = ย้ายไป category ที่อยู่ก่อนหน้าในลำดับ, Moved_Down = ย้ายไป category ที่อยู่ถัดไป
+        if len(self.month_codes) < 2:
+            return pd.DataFrame()
+        categories = self.cubes[self.month_codes[0]].categories[dim]
+        n_categories, n_months = len(categories), len(self.month_codes)
+        row_codes = self._row_codes(dim)
+        # แถวที่เดือนถัดไปของ respondent คือเดือนติดกัน -> คู่ (code เดือนนี้, code เดือนหน้า)
+        consecutive = np.flatnonzero(self.next_months[:-1] == self.months[:-1] + 1)
+        flat = (self.months[consecutive].astype(np.intp) * n_categories + row_codes[consecutive]) * n_categories + row_codes[consecutive + 1]
+        counts = np.bincount(flat, minlength=n_months * n_categories * n_categories)
+        matrices = counts.reshape(n_months, n_categories, n_categories)[:-1]  # [เดือนก่อน, category เดิม, category ใหม่]
+
+        ranked = np.array([category not in unranked for category in categories])
+        ranked_matrices = matrices[:, ranked][:, :, ranked]
+        tracked = matrices.sum(axis=(1, 2))
+        unchanged = np.trace(matrices, axis1=1, axis2=2)
+        ranked_changed = ranked_matrices.sum(axis=(1, 2)) - np.trace(ranked_matrices, axis1=1, axis2=2)
+        moved_up = np.tril(np.ones((ranked.sum(), ranked.sum()), dtype=bool), -1)
+        return pd.DataFrame({
+            'Tracked_Respondents': tracked,
+            'Unchanged': unchanged,
+            'Moved_Up': ranked_matrices[:, moved_up].sum(axis=1),
+            'Moved_Down': ranked_matrices[:, moved_up.T].sum(axis=1),
+            'To_Or_From_Unspecified': tracked - unchanged - ranked_changed,
+        }, index=pd.Index(self.month_codes[1:], name='Month'))
+
+
+def _month_ids(month_code, folder, loaded):
+    # ID ที่ไม่ซ้ำ (เรียงแล้ว) ของเดือนนั้นจาก sorted ID index ของ cube (โหลดแต่ละเดือนครั้งเดียวต่อการเรียก)
+    if month_code not in loaded:
+        loaded[month_code] = unique_respondents(respondent_cube.RespondentCube.load(respondent_cube.cube_path(month_code, folder)))[0]
+    return loaded[month_code]
+
+
+def tracking_counts(month_code, months, folder=respondent_cube.cube_folder, loaded=None):
+    # New/Returning/Churned ของเดือนนั้นเทียบกับเดือนก่อนหน้าใน months (อ่านแค่ 2 cube)
+    loaded = {} if loaded is None else loaded
+    ids = _month_ids(month_code, folder, loaded)
+    earlier = [m for m in months if m < month_code]
+    if not earlier:
+        return {'New_Respondents_Count': len(ids), 'Returning_Respondents_Count': 0, 'Churned_Respondents_Count': 0}
+    previous_ids = _month_ids(earlier[-1], folder, loaded)
+    returning = len(np.intersect1d(ids, previous_ids, assume_unique=True))
+    return {
+        'New_Respondents_Count': len(ids) - returning,
+        'Returning_Respondents_Count': returning,
+        'Churned_Respondents_Count': len(previous_ids) - returning,
+    }
+
+
+def _row_month_codes(df_rows):
+    return pd.to_datetime(df_rows['Collected_Month']).dt.strftime('%Y%m')
+
+
+def add_tracking_columns(df_rows, folder=respondent_cube.cube_folder):
+    # เติม New/Returning/Churned ให้แถว MS ที่เดือนนั้นมี cube พร้อม Respondent_ID
+    # แถวอื่น (DS, เดือนที่ไม่มี cube) เป็นค่าว่าง (pd.NA -> NULL ใน summary) เพราะ 0 จะอ่านเป็นจำนวนจริง
+    df_rows = df_rows.copy()
+    for col in tracking_columns:
+        df_rows[col] = pd.array([pd.NA] * len(df_rows), dtype='Int64')
+    months = available_months(folder)
+    row_months = _row_month_codes(df_rows)
+    tracked = (df_rows['Panel_Source'] == tracking_panel) & row_months.isin(months)
+    loaded = {}
+    for index in df_rows.index[tracked]:
+        for col, count in tracking_counts(row_months[index], months, folder, loaded).items():
+            df_rows.loc[index, col] = count
+    return df_rows
+
+
+def following_months(df_rows, folder=respondent_cube.cube_folder):
+    # เดือนถัดไปที่มี cube ของแต่ละเดือน MS ใน df_rows (ที่ไม่ได้อยู่ใน df_rows เอง): ค่า tracking ของเดือนนั้นเปลี่ยน
+    # เพราะเดือนก่อนหน้าของมันเปลี่ยน (เช่น ประมวลผล 2025-06 แล้วค่อย 2025-05) -> คืนรายการ 'YYYY-MM-01'
+    months = available_months(folder)
+    incoming = set(_row_month_codes(df_rows[df_rows['Panel_Source'] == tracking_panel]))
+    following = set()
+    for month_code in incoming:
+        later = [m for m in months if m > month_code]
+        if later and later[0] not in incoming:
+            following.add(later[0])
+    return [f'{m[:4]}-{m[4:]}-01' for m in sorted(following)]
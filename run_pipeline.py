@@ -0,0 +1,51 @@
+import argparse
+import os
+
+import pandas as pd
+
+import panel_adapters
+from combine_and_save_data import merge_into_summary, publish_summary, temp_result_path, output_summary_file, processed_data_folder
+
+# --- Pipeline ทั้งเดือนในหน่วยความจำ: ทุก panel (พร้อมกัน) -> combine -> summary โดยไม่ต้องเขียน/อ่าน temp CSV ---
+# ตัวอย่าง: python run_pipeline.py 2025-06 [--write-temp] [--incremental] [--ms-workers 32] [--panels DS MS]
+
+
+def run_month(current_month, write_temp_files=False, output_summary_file=output_summary_file, incremental_ms=False, ms_workers=1,
+              panels=None):
+    current_month = pd.to_datetime(current_month).strftime('%Y-%m-%d')
+    # ทุก adapter ที่ลงทะเบียนไว้ (หรือเฉพาะ panels) รันพร้อมกันคนละ process (ดู panel_adapters.py)
+    # incremental_ms=True -> MS ประมวลผลเฉพาะ respondent ใหม่/เปลี่ยนแปลงจาก cumulative extract (ดู ms_incremental.py)
+    panel_options = {'MS': {'incremental': incremental_ms, 'workers': ms_workers}}
+    panel_results = panel_adapters.run_adapters(current_month, panels, panel_options)
+
+    # temp CSV เป็นทางเลือก (ไว้ตรวจสอบหรือส่งต่อให้ combine_and_save_data.py แบบเดิม)
+    if write_temp_files:
+        if not os.path.exists(processed_data_folder):
+            os.makedirs(processed_data_folder)
+        for panel, df_result in panel_results.items():
+            df_result.to_csv(temp_result_path(panel, current_month), index=False, encoding='utf-8')
+
+    df_current_month_combined = pd.concat(panel_results.values(), ignore_index=True)
+    total_rows = merge_into_summary(df_current_month_combined, output_summary_file)
+    publish_summary(output_summary_file)
+    return total_rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Process every registered panel for one month and update the summary in memory.')
+    parser.add_argument('month', help='month to process, e.g. 2025-06')
+    parser.add_argument('--write-temp', action='store_true', help='also write temp_*_data_YYYYMM.csv to processed_data/')
+    parser.add_argument('--incremental', action='store_true', help='update MS from new/changed respondents only (intraday refresh)')
+    parser.add_argument('--ms-workers', type=int, default=1, help='processes used to split one large MS file (default 1)')
+    parser.add_argument('--panels', nargs='+', choices=panel_adapters.registered_panels(), help='panels to process (default: all)')
+    args = parser.parse_args()
+
+    try:
+        total_rows = run_month(args.month, write_temp_files=args.write_temp, incremental_ms=args.incremental, ms_workers=args.ms_workers,
+                               panels=args.panels)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        exit()
+
+    print(f"\nSuccessfully updated '{output_summary_file}' with data for {args.month}.")
+    print(f"Total rows in {output_summary_file}: {total_rows}")
@@ -0,0 +1,312 @@
+import contextlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+import mapping_registry
+import respondent_cube
+from panel_io import pa
+
+# --- Storage ของ monthly summary: SQLite ที่มี primary key (Panel_Source, Collected_Month) ---
+# การอัปเดตเดือนหนึ่งจะ upsert เฉพาะแถวของ (panel, month) นั้น ไม่ต้องอ่าน/เขียนทั้งไฟล์ใหม่
+# ทั้ง combine_and_save_data.py และ dashboard.py อ่าน/เขียนผ่านโมดูลนี้
+
+summary_db_file = 'monthly_profiling_summary.db'
+legacy_summary_csv = 'monthly_profiling_summary.csv'  # ใช้ seed ฐานข้อมูลครั้งแรกถ้ายังไม่มีไฟล์ .db
+summary_table = 'monthly_summary'
+summary_key_columns = ['Panel_Source', 'Collected_Month']
+# คอลัมน์ที่เป็น NULL ได้ (ไม่มีข้อมูล เช่น tracking ของ panel ที่ไม่มี Respondent_ID) คอลัมน์ Count อื่นเป็น NOT NULL DEFAULT 0
+nullable_columns = mapping_registry.tracking_columns
+
+# snapshot แบบมี version ให้ dashboard อ่าน: เขียนไฟล์ชั่วคราวแล้ว os.replace (atomic) ทั้ง snapshot และ manifest
+# dashboard จึงไม่มีทางเห็นไฟล์ที่เขียนไม่เสร็จ และใช้ version เป็น cache key ได้
+snapshot_folder = './summary_snapshots/'
+snapshot_manifest_file = os.path.join(snapshot_folder, 'manifest.json')
+snapshots_to_keep = 5
+# publish ทีละ process: lock file ที่สร้างด้วย O_EXCL (ใครสร้างได้ก่อนได้ lock) ครอบตั้งแต่จอง version จนเขียน manifest เสร็จ
+# run_pipeline กับ backfill ที่ publish พร้อมกันจึงไม่ได้ version ซ้ำกันหรือเขียน manifest ย้อนไป version เก่า
+# lock ที่ค้างนานกว่า publish_lock_timeout วินาที (process ที่ถือไว้ตายไปแล้ว) ถูกลบทิ้ง
+publish_lock_file = os.path.join(snapshot_folder, 'publish.lock')
+publish_lock_timeout = 600
+
+# dataset ของ dashboard: snapshot เดียวกันแต่แปลง type และคำนวณคอลัมน์ที่ dashboard ใช้ไว้แล้ว (Month_Year, Silver_Gen_Count, ...)
+# เขียนคู่กับ snapshot ทุก version เป็นไฟล์ binary (Parquet ถ้ามี pyarrow ไม่งั้น pickle) dashboard จึงอ่านครั้งเดียวแล้วใช้ได้ทันที
+dashboard_dataset_extension = '.parquet' if pa is not None else '.pkl'
+
+
+def _existing_columns(conn):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({summary_table})')]
+
+
+def _column_def(col):
+    return f'"{col}" INTEGER' if col in nullable_columns else f'"{col}" INTEGER NOT NULL DEFAULT 0'
+
+
+def _create_table(conn, table, columns):
+    count_columns = [col for col in columns if col not in summary_key_columns]
+    column_defs = ', '.join(
+        ['"Panel_Source" TEXT NOT NULL', '"Collected_Month" TEXT NOT NULL'] + [_column_def(col) for col in count_columns]
+    )
+    conn.execute(f'CREATE TABLE {table} ({column_defs}, PRIMARY KEY ("Panel_Source", "Collected_Month"))')
+
+
+def _make_nullable(conn, existing):
+    # ฐานข้อมูลเก่าสร้างคอลัมน์ tracking เป็น NOT NULL DEFAULT 0 -> สร้างตารางใหม่ (SQLite แก้ constraint ของคอลัมน์ไม่ได้)
+    # แถวที่ tracking เป็น 0 ทั้งหมด (DS หรือเดือนที่ไม่มี cube) ถูกเขียนเป็น 0 แทน "ไม่มีข้อมูล" -> เปลี่ยนเป็น NULL
+    quoted = ', '.join(f'"{col}"' for col in existing)
+    _create_table(conn, f'{summary_table}_new', existing)
+    conn.execute(f'INSERT INTO {summary_table}_new ({quoted}) SELECT {quoted} FROM {summary_table}')
+    tracked = [col for col in nullable_columns if col in existing]
+    if tracked:
+        set_null = ', '.join(f'"{col}" = NULL' for col in tracked)
+        all_zero = ' AND '.join(f'"{col}" = 0' for col in tracked)
+        conn.execute(f'UPDATE {summary_table}_new SET {set_null} WHERE {all_zero}')
+    conn.execute(f'DROP TABLE {summary_table}')
+    conn.execute(f'ALTER TABLE {summary_table}_new RENAME TO {summary_table}')
+
+
+def _ensure_columns(conn, columns):
+    # สร้างตารางถ้ายังไม่มี และเพิ่มคอลัมน์ Count ใหม่ที่ยังไม่เคยมี (ค่าเริ่มต้น 0 หรือ NULL สำหรับ nullable_columns)
+    existing = _existing_columns(conn)
+    if not existing:
+        _create_table(conn, summary_table, columns)
+        return
+    not_null = {row[1] for row in conn.execute(f'PRAGMA table_info({summary_table})') if row[3]}
+    if not_null & set(nullable_columns):
+        _make_nullable(conn, existing)
+    for col in columns:
+        if col not in existing:
+            conn.execute(f'ALTER TABLE {summary_table} ADD COLUMN {_column_def(col)}')
+
+
+def _upsert(conn, df):
+    df = df.copy()
+    df['Collected_Month'] = pd.to_datetime(df['Collected_Month']).dt.strftime('%Y-%m-%d')
+    columns = list(df.columns)
+    _ensure_columns(conn, columns)
+    quoted = ', '.join(f'"{col}"' for col in columns)
+    placeholders = ', '.join('?' for _ in columns)
+    updates = ', '.join(f'"{col}" = excluded."{col}"' for col in columns if col not in summary_key_columns)
+    conn.executemany(
+        f'INSERT INTO {summary_table} ({quoted}) VALUES ({placeholders}) '
+        f'ON CONFLICT ("Panel_Source", "Collected_Month") DO UPDATE SET {updates}',
+        df.astype(object).where(df.notna(), None).itertuples(index=False, name=None),
+    )
+
+
+def connect(db_file=summary_db_file):
+    is_new = not os.path.exists(db_file)
+    conn = sqlite3.connect(db_file)
+    if is_new and os.path.exists(legacy_summary_csv):
+        with conn:
+            _upsert(conn, pd.read_csv(legacy_summary_csv))
+    return conn
+
+
+def upsert_rows(df, db_file=summary_db_file):
+    conn = connect(db_file)
+    try:
+        with conn:
+            _upsert(conn, df)
+    finally:
+        conn.close()
+
+
+def load_summary(db_file=summary_db_file, panels=None, months=None):
+    conn = connect(db_file)
+    try:
+        if not _existing_columns(conn):
+            return pd.DataFrame()
+        conditions, params = [], []
+        if panels:
+            conditions.append(f'"Panel_Source" IN ({", ".join("?" for _ in panels)})')
+            params.extend(panels)
+        if months:
+            months = [pd.to_datetime(month).strftime('%Y-%m-%d') for month in months]
+            conditions.append(f'"Collected_Month" IN ({", ".join("?" for _ in months)})')
+            params.extend(months)
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        df = pd.read_sql_query(
+            f'SELECT * FROM {summary_table}{where} ORDER BY "Collected_Month", "Panel_Source"', conn, params=params
+        )
+        return _nullable_counts(df)
+    finally:
+        conn.close()
+
+
+def _nullable_counts(df):
+    # NULL -> pd.NA (Int64) แทน float NaN
+    columns = [col for col in nullable_columns if col in df.columns]
+    df[columns] = df[columns].astype('Int64')
+    return df
+
+
+def count_rows(db_file=summary_db_file):
+    conn = connect(db_file)
+    try:
+        if not _existing_columns(conn):
+            return 0
+        return conn.execute(f'SELECT COUNT(*) FROM {summary_table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def export_csv(output_file=legacy_summary_csv, db_file=summary_db_file):
+    load_summary(db_file).to_csv(output_file, index=False, encoding='utf-8')
+
+
+def _atomic_write(path, write):
+    # write(f) เขียนลงไฟล์ชั่วคราวในโฟลเดอร์เดียวกัน แล้ว rename ทับ path ในครั้งเดียว
+    folder = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp_', suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_manifest():
+    try:
+        with open(snapshot_manifest_file, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def current_version():
+    manifest = read_manifest()
+    return manifest['version'] if manifest else None
+
+
+def snapshot_path(version):
+    return os.path.join(snapshot_folder, f'monthly_profiling_summary_v{version:06d}.csv')
+
+
+def dashboard_dataset_path(version, extension=dashboard_dataset_extension):
+    return os.path.join(snapshot_folder, f'dashboard_dataset_v{version:06d}{extension}')
+
+
+def derive_dashboard_columns(df):
+    # Collected_Month เป็น datetime, Month_Year สำหรับ filter และจำนวนของแต่ละ audience (ตาม respondent_cube.audience_filters)
+    #   Silver_Gen = อายุ 60+, Auto = มีรถที่บ้านอย่างน้อย 1 คัน, UPC = ต่างจังหวัด (ไม่รวม กทม. และปริมณฑล)
+    df = df.copy()
+    df['Collected_Month'] = pd.to_datetime(df['Collected_Month'])
+    df['Month_Year'] = df['Collected_Month'].dt.strftime('%d-%m-%Y')
+    for audience, filters in respondent_cube.audience_filters.items():
+        columns = [
+            f'{mapping_registry.common_dimensions[dim][0]}_{category}_Count'
+            for dim, categories in filters.items() for category in categories
+        ]
+        df[f'{audience}_Count'] = df[columns].sum(axis=1)
+    count_columns = [col for col in df.columns if col.endswith('_Count') and col not in nullable_columns]
+    df[count_columns] = df[count_columns].astype('int64')
+    df = _nullable_counts(df)
+    df['Panel_Source'] = df['Panel_Source'].astype('category')
+    return df
+
+
+def _write_dashboard_dataset(path, df):
+    folder = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp_', suffix=os.path.basename(path))
+    os.close(fd)
+    try:
+        if path.endswith('.parquet'):
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def _publish_lock():
+    while True:
+        try:
+            fd = os.open(publish_lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(publish_lock_file) > publish_lock_timeout:
+                    os.remove(publish_lock_file)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.1)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        os.remove(publish_lock_file)
+
+
+def publish_snapshot(db_file=summary_db_file):
+    # อ่านทั้ง summary แล้วเขียน snapshot ใหม่ทั้งชุด: เรียกครั้งเดียวตอนจบ run/backfill ไม่ใช่ทุกครั้งที่ upsert
+    os.makedirs(snapshot_folder, exist_ok=True)
+    with _publish_lock():
+        return _publish_snapshot(db_file)
+
+
+def _publish_snapshot(db_file):
+    version = (current_version() or 0) + 1
+    df = load_summary(db_file)
+
+    _atomic_write(snapshot_path(version), lambda f: df.to_csv(f, index=False))
+    _write_dashboard_dataset(dashboard_dataset_path(version), derive_dashboard_columns(df))
+    manifest = {
+        'version': version,
+        'file': os.path.basename(snapshot_path(version)),
+        'dashboard_file': os.path.basename(dashboard_dataset_path(version)),
+        'rows': len(df),
+        'published_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+    }
+    _atomic_write(snapshot_manifest_file, lambda f: json.dump(manifest, f, indent=2))
+
+    # ลบ snapshot เก่า (เก็บไว้ไม่กี่ version เผื่อ session ที่ยังอ่านไฟล์เดิมอยู่)
+    stale_version = version - snapshots_to_keep
+    if stale_version >= 1:
+        for stale_path in [snapshot_path(stale_version)] + [dashboard_dataset_path(stale_version, ext) for ext in ('.parquet', '.pkl')]:
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+    return version
+
+
+def load_snapshot(version, db_file=summary_db_file):
+    # version=None (ยังไม่เคย publish) -> อ่านจากฐานข้อมูลตรง ๆ
+    if version is None:
+        return load_summary(db_file)
+    return _nullable_counts(pd.read_csv(snapshot_path(version)))
+
+
+def dataset_cache_key():
+    # (version, mtime ของ manifest): เปลี่ยนทันทีที่มีการ publish snapshot ใหม่ (หรือ manifest ถูกเขียนทับ)
+    try:
+        mtime_ns = os.stat(snapshot_manifest_file).st_mtime_ns
+    except FileNotFoundError:
+        return None, None
+    return current_version(), mtime_ns
+
+
+def load_dashboard_dataset(version, db_file=summary_db_file):
+    # อ่าน dataset ที่ derive ไว้แล้วของ version นั้น (binary read ครั้งเดียว)
+    # snapshot เก่าที่ยังไม่มี dataset (หรือยังไม่เคย publish) -> derive จาก snapshot/ฐานข้อมูล
+    manifest = read_manifest()
+    if version is not None and manifest and manifest.get('version') == version and manifest.get('dashboard_file'):
+        path = os.path.join(snapshot_folder, manifest['dashboard_file'])
+        if os.path.exists(path):
+            return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_pickle(path)
+    df = load_snapshot(version, db_file)
+    return derive_dashboard_columns(df) if len(df) else df
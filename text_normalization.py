@@ -0,0 +1,21 @@
+import re
+import unicodedata
+
+# --- Normalize คำตอบภาษาไทย/อังกฤษก่อน map เป็น category ---
+# ใช้กับทั้งค่าดิบและ key ของ mapping tables จึงจับคู่ได้แม้ export ต่างรอบจะมีช่องว่าง/ขึ้นบรรทัดใหม่/ตัวอักษรล่องหนต่างกัน
+# เช่น 'กลุ่มอาชีพ รายได้ไม่ประจำ เช่น \nฟรีแลนซ์ , อาชีพอิสระ' กับ 'กลุ่มอาชีพ รายได้ไม่ประจำ เช่น ฟรีแลนซ์ , อาชีพอิสระ'
+# ถูกเรียกเฉพาะค่า unique (ผ่าน category_codes.lookup_codes) ต้นทุนจึงขึ้นกับจำนวนคำตอบที่ไม่ซ้ำกัน
+
+_zero_width = dict.fromkeys(map(ord, '​‌‍⁠﻿­'), None)
+_whitespace = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    # NFC -> ตัด zero-width -> นิคหิต + สระอา เป็นสระอำ -> ช่องว่าง/ขึ้นบรรทัดใหม่หลายตัวเหลือช่องเดียว -> strip -> casefold
+    text = unicodedata.normalize('NFC', str(value)).translate(_zero_width)
+    text = text.replace('ํา', 'ำ')
+    return _whitespace.sub(' ', text).strip().casefold()
+
+
+def normalize_keys(mapping):
+    return {normalize_text(key): value for key, value in mapping.items()}
@@ -0,0 +1,91 @@
+import functools
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# --- Cache ของ dashboard ที่ใช้ร่วมกันทุก session ใน process เดียวกัน (ตาราง derive แล้ว และ figure spec ที่ serialize แล้ว) ---
+# key = (section, filters, data version): ทุก session ที่เลือก filter เดียวกันบน snapshot เดียวกันได้ผลลัพธ์ชุดเดียวกัน
+# จำกัดหน่วยความจำด้วย max_bytes: เกินเมื่อไหร่ตัดรายการที่ไม่ได้ใช้นานที่สุดออก (LRU)
+#   snapshot ใหม่ -> key ใหม่ รายการของ version เก่าจะไม่ถูกใช้อีกและถูกตัดออกเองตามลำดับ LRU
+# ค่าที่ได้จาก cache เป็น object เดียวกันที่ทุก session ใช้ร่วมกัน ห้ามแก้ไข (ถ้าต้องแก้ให้ copy ก่อน)
+# dashboard สร้าง ViewCache ตัวเดียวต่อ process ด้วย st.cache_resource
+
+
+def estimated_bytes(value):
+    # ขนาดโดยประมาณของค่าที่เก็บ (DataFrame นับแบบ deep, tuple/list/dict นับรวมสมาชิก)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimated_bytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimated_bytes(k) + estimated_bytes(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class ViewCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, bytes) เรียงจากใช้ล่าสุดน้อยไปมาก
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, section, key, build):
+        cache_key = (section, key)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key][0]
+            self.misses += 1
+        # build นอก lock: session อื่นไม่ต้องรอ (ถ้า build key เดียวกันพร้อมกันจะเก็บผลล่าสุด)
+        value = build()
+        self._store(cache_key, value)
+        return value
+
+    def cached(self, section):
+        # decorator: arguments ของฟังก์ชัน (filters + data version) เป็น key ภายใน section
+        def decorator(build):
+            @functools.wraps(build)
+            def wrapper(*args):
+                return self.get_or_build(section, args, lambda: build(*args))
+            return wrapper
+        return decorator
+
+    def _store(self, cache_key, value):
+        size = estimated_bytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if cache_key in self._entries:
+                self._bytes -= self._entries.pop(cache_key)[1]
+            self._entries[cache_key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            sections = {}
+            for section, _ in self._entries:
+                sections[section] = sections.get(section, 0) + 1
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'sections': sections,
+            }